@@ -7,6 +7,11 @@ Read Murata / NXP Type-2BP UART stream and print only:
 
 Baud-rate 3 000 000 Bd is the SR150 default ≥ v04.04.03
 Change SERIAL_PORT if your port differs.
+
+MONITOR_MODE (default) parses every line but only redraws a per-anchor
+status view MONITOR_FPS times a second (see uwb_monitor.py), so the
+terminal never slows the UART reader down. Set it to False for the old
+print-per-triple output.
 """
 import re
 import serial
@@ -14,12 +19,20 @@ import serial
 SERIAL_PORT = "/dev/ttyUSB0"      # or /dev/ttyAMA0, /dev/ttyACM0 … depending on rpi version. check port using "mode" in windows terminal after ssh-ing into rpi
 BAUD       = 3_000_000
 
+MONITOR_MODE = True
+MONITOR_FPS  = 4
+
 # Pre-compiled regexes (tolerate any spaces around the colon)
 re_dist  = re.compile(r"TWR\[\d+\]\.distance\s*:\s*([-\d.]+)")
 re_azimu = re.compile(r"TWR\[\d+\]\.aoa_azimuth\s*:\s*([-\d.]+)")
 re_elev  = re.compile(r"TWR\[\d+\]\.aoa_elevation\s*:\s*([-\d.]+)")
 
 def main() -> None:
+    if MONITOR_MODE:
+        from uwb_monitor import run
+        run(SERIAL_PORT, BAUD, fps=MONITOR_FPS)
+        return
+
     ser = serial.Serial(SERIAL_PORT, BAUD)
     distance = azimuth = elevation = None
 
@@ -1,5 +1,14 @@
 import serial
 
+# Monitor mode: a compact per-anchor view plus a raw-line tail, redrawn a few times a second
+# (printing every line over SSH at 3 Mbaud lets the UART buffer overrun). False = print every line.
+MONITOR_MODE = True
+
+if MONITOR_MODE:
+    from uwb_monitor import run
+    run('/dev/ttyUSB0', 3000000, fps=4, tail=20, tail_every=1)
+    raise SystemExit
+
 # Open the serial port (adjust the port and baud rate as per your setup)
 ser = serial.Serial('/dev/ttyUSB0', 3000000)  # Adjust the port and baud rate
 
@@ -0,0 +1,610 @@
+#!/usr/bin/env python3
+# async_gateway.py — UART→vectors→MQTT on one asyncio loop, bounded end to end
+#
+#   serial fd ──add_reader──▶ line queue ──parse──▶ publish queue ──▶ MQTT
+#                                                        │  broker down
+#                                                        └──▶ disk spool ──(replayed on reconnect)──▶ MQTT
+#
+# Both queues are bounded with an explicit overflow policy:
+#   drop_oldest  discard the oldest queued item (default for lines: stay current)
+#   drop_newest  discard the incoming item
+#   block        backpressure; for the line queue this pauses the fd reader so the
+#                kernel/UART buffer absorbs (and eventually overruns) instead of RAM
+# While the broker is unreachable the publisher drains its queue into a size-capped
+# on-disk spool, so memory stays flat for any outage length. On reconnect the spool is
+# replayed oldest first (at-least-once: a segment cut short by a new outage is resent).
+#
+# The MQTT side is a small built-in 3.1.1 client (QoS 0/1 with an in-flight window) so
+# every write is awaited; nothing queues inside a background thread like paho's loop_start().
+#
+# Run (instead of master.py / slave.py):
+#   python3 async_gateway.py --device-id anchor-01 --broker mqtt-broker.local
+# Outage demo against a local stand-in broker that is stopped and started:
+#   python3 async_gateway.py --selftest
+import os, re, sys, json, time, struct, asyncio, argparse, tempfile, traceback
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # shared uwb_* modules
+from uwb_pending import PendingTable, F_R, F_AZ, F_EL
+from uwb_timing import WallClock, HeaderCache
+from uwb_poses import PoseRegistry, DEFAULT_POSE_FILE
+
+INCLUDE_RAW, INCLUDE_LOCAL, INCLUDE_GLOBAL = True, True, True
+POSE_FILE = os.getenv("POSE_FILE", DEFAULT_POSE_FILE)  # anchor yaw/pitch/roll, reloaded on change (uwb_poses.py)
+
+MAX_ANCHORS, PENDING_TTL_LINES, PENDING_TTL_MS = 16, 64, 250  # see uwb_pending.py
+MAX_LINE_BYTES = 4096   # a "line" longer than this without \n is garbage, drop it
+POLICIES = ("drop_oldest", "drop_newest", "block")
+
+re_dist  = re.compile(r"TWR\[(\d+)\]\.distance\s*:\s*([-\d.]+)")
+re_azimu = re.compile(r"TWR\[(\d+)\]\.aoa_azimuth\s*:\s*([-\d.]+)")
+re_elev  = re.compile(r"TWR\[(\d+)\]\.aoa_elevation\s*:\s*([-\d.]+)")
+
+
+# ---------- bounded queue ----------
+class BoundedQueue(asyncio.Queue):
+    """asyncio.Queue with an overflow policy for non-blocking producers."""
+    def __init__(self, maxsize: int, policy: str):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown overflow policy {policy!r} (choose from {POLICIES})")
+        super().__init__(maxsize)
+        self.policy = policy
+        self.dropped = 0
+
+    def offer(self, item) -> bool:
+        """Enqueue without waiting. False only under "block" when full (caller must back off)."""
+        if not self.full():
+            self.put_nowait(item)
+            return True
+        if self.policy == "drop_oldest":
+            self.get_nowait()
+            self.put_nowait(item)
+            self.dropped += 1
+            return True
+        if self.policy == "drop_newest":
+            self.dropped += 1
+            return True
+        return False
+
+
+# ---------- serial fd reader ----------
+class FdLineReader:
+    """Non-blocking line reader on a file descriptor (serial port, pipe) via loop.add_reader."""
+    def __init__(self, fd: int, queue: BoundedQueue):
+        self.fd = fd
+        self.queue = queue
+        self.buf = b""
+        self.held = []          # (t_rx, line) waiting for room under the "block" policy
+        self.paused = 0         # times the reader was paused for backpressure
+        self.garbage = 0        # over-long fragments dropped
+        self.eof = asyncio.Event()
+        self._loop = None
+
+    def start(self):
+        os.set_blocking(self.fd, False)
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(self.fd, self._on_readable)
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.remove_reader(self.fd)
+
+    def _on_readable(self):
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return
+        t_rx = time.monotonic_ns()  # arrival of this chunk; every line it completes gets this stamp
+        if not data:
+            self.stop(); self.eof.set(); return
+        lines = (self.buf + data).split(b"\n")
+        self.buf = lines.pop()
+        if len(self.buf) > MAX_LINE_BYTES:
+            self.buf = b""; self.garbage += 1
+        for i, line in enumerate(lines):
+            if not self.queue.offer((t_rx, line)):
+                self.held = [(t_rx, l) for l in lines[i:]]
+                self.stop(); self.paused += 1
+                self._loop.create_task(self._resume())
+                return
+
+    async def _resume(self):
+        while self.held:
+            await self.queue.put(self.held.pop(0))
+        self._loop.add_reader(self.fd, self._on_readable)
+
+
+# ---------- disk spool ----------
+class DiskSpool:
+    """Append-only, size-capped spool of length-prefixed payloads in numbered segment files."""
+    REC = struct.Struct("<I")
+
+    def __init__(self, folder: str, segment_bytes: int = 1 << 20, max_bytes: int = 64 << 20):
+        self.folder = folder
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.dropped_segments = 0
+        os.makedirs(folder, exist_ok=True)
+        # segments left over from a previous run are replayed too
+        self.segments = sorted(os.path.join(folder, n) for n in os.listdir(folder) if n.startswith("spool_"))
+        self.next_no = 1 + max((int(os.path.basename(p)[6:18]) for p in self.segments), default=0)
+        self.total = sum(os.path.getsize(p) for p in self.segments)
+        self._wf = None
+
+    def _rotate(self):
+        if self._wf is not None:
+            self._wf.close(); self._wf = None
+
+    def append(self, payload: bytes):
+        if self._wf is None or self._wf.tell() >= self.segment_bytes:
+            self._rotate()
+            path = os.path.join(self.folder, f"spool_{self.next_no:012d}.bin")
+            self.next_no += 1
+            self._wf = open(path, "ab")
+            self.segments.append(path)
+        self._wf.write(self.REC.pack(len(payload)) + payload)
+        self._wf.flush()
+        self.total += self.REC.size + len(payload)
+        while self.total > self.max_bytes and len(self.segments) > 1:
+            self.remove(self.segments[0]); self.dropped_segments += 1
+
+    def pending(self) -> bool:
+        return bool(self.segments)
+
+    def oldest(self):
+        """Path of the oldest segment, closed for writing; None if the spool is empty."""
+        if not self.segments:
+            return None
+        if len(self.segments) == 1:
+            self._rotate()
+        return self.segments[0]
+
+    def read(self, path: str):
+        with open(path, "rb") as f:
+            data = f.read()
+        out, i = [], 0
+        while i + self.REC.size <= len(data):
+            (n,) = self.REC.unpack_from(data, i)
+            if i + self.REC.size + n > len(data):
+                break  # torn tail from a crash
+            out.append(data[i + self.REC.size:i + self.REC.size + n])
+            i += self.REC.size + n
+        return out
+
+    def remove(self, path: str):
+        if self._wf is not None and self._wf.name == path:
+            self._rotate()
+        try:
+            self.total -= os.path.getsize(path); os.remove(path)
+        except FileNotFoundError:
+            pass
+        self.segments.remove(path)
+
+
+# ---------- minimal MQTT 3.1.1 ----------
+def _mqtt_str(s: str) -> bytes:
+    b = s.encode("utf-8")
+    return struct.pack("!H", len(b)) + b
+
+def _mqtt_packet(hdr: int, body: bytes) -> bytes:
+    n, rl = len(body), bytearray()
+    while True:
+        n, d = n >> 7, n & 0x7F
+        rl.append(d | (0x80 if n else 0))
+        if not n:
+            return bytes([hdr]) + bytes(rl) + body
+
+async def read_packet(reader: asyncio.StreamReader):
+    """(fixed header byte, body). Raises asyncio.IncompleteReadError on EOF."""
+    hdr = (await reader.readexactly(1))[0]
+    n, shift = 0, 0
+    while True:
+        d = (await reader.readexactly(1))[0]
+        n |= (d & 0x7F) << shift
+        shift += 7
+        if not d & 0x80:
+            break
+    return hdr, await reader.readexactly(n) if n else b""
+
+
+class MiniMqttClient:
+    """Just enough MQTT for a publisher: CONNECT, PUBLISH (QoS 0/1), PINGREQ, DISCONNECT."""
+    def __init__(self, client_id: str, keepalive: int = 30, max_inflight: int = 20):
+        self.client_id = client_id
+        self.keepalive = keepalive
+        self.max_inflight = max_inflight
+        self.inflight = {}      # packet id -> payload, until PUBACK
+        self.lost = asyncio.Event()
+        self._space = asyncio.Event()
+        self._next_pid = 0
+        self._reader = self._writer = None
+        self._tasks = []
+
+    async def connect(self, host: str, port: int, timeout: float = 3.0):
+        self._reader, self._writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        body = _mqtt_str("MQTT") + bytes([4, 0x02]) + struct.pack("!H", self.keepalive) + _mqtt_str(self.client_id)
+        self._writer.write(_mqtt_packet(0x10, body))
+        await self._writer.drain()
+        hdr, ack = await asyncio.wait_for(read_packet(self._reader), timeout)
+        if hdr >> 4 != 2 or len(ack) < 2 or ack[1] != 0:
+            self._writer.close()
+            raise ConnectionError(f"CONNACK refused rc={ack[1] if len(ack) > 1 else '?'}")
+        self._tasks = [asyncio.create_task(self._read_loop()), asyncio.create_task(self._ping_loop())]
+
+    def _mark_lost(self):
+        self.lost.set(); self._space.set()
+        if self._writer is not None:
+            self._writer.close()
+
+    async def _read_loop(self):
+        try:
+            while True:
+                hdr, body = await asyncio.wait_for(read_packet(self._reader), self.keepalive * 1.5)
+                if hdr >> 4 == 4 and len(body) >= 2:  # PUBACK
+                    self.inflight.pop(struct.unpack("!H", body[:2])[0], None)
+                    self._space.set()
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, OSError):
+            pass
+        finally:
+            self._mark_lost()
+
+    async def _ping_loop(self):
+        try:
+            while not self.lost.is_set():
+                await asyncio.sleep(self.keepalive / 2)
+                self._writer.write(b"\xc0\x00")
+                await self._writer.drain()
+        except OSError:
+            self._mark_lost()
+
+    async def publish(self, topic: str, payload: bytes, qos: int = 0):
+        while len(self.inflight) >= self.max_inflight and not self.lost.is_set():
+            self._space.clear()
+            await self._space.wait()
+        if self.lost.is_set():
+            raise ConnectionError("broker connection lost")
+        body = _mqtt_str(topic)
+        if qos:
+            self._next_pid = self._next_pid % 0xFFFF + 1
+            self.inflight[self._next_pid] = payload
+            body += struct.pack("!H", self._next_pid)
+        self._writer.write(_mqtt_packet(0x30 | (qos << 1), body + payload))
+        await self._writer.drain()   # raises once the transport is gone
+
+    async def flush(self):
+        """Wait until every QoS 1 publish is acknowledged."""
+        while self.inflight and not self.lost.is_set():
+            self._space.clear()
+            await self._space.wait()
+        if self.inflight:
+            raise ConnectionError("broker connection lost")
+
+    async def close(self):
+        if self._writer is not None and not self._writer.is_closing():
+            try:
+                self._writer.write(b"\xe0\x00"); await self._writer.drain()
+            except OSError:
+                pass
+        for t in self._tasks:
+            t.cancel()
+        self._mark_lost()
+
+
+# ---------- gateway ----------
+class Gateway:
+    def __init__(self, fd: int, device_id: str, broker: str, port: int = 1883, qos: int = 0,
+                 line_queue: int = 4096, line_policy: str = "drop_oldest",
+                 pub_queue: int = 1024, pub_policy: str = "block",
+                 spool_dir: str = "./spool", spool_max_bytes: int = 64 << 20, reconnect_s: float = 2.0):
+        self.device_id = device_id
+        self.topic = f"house/anchors/{device_id}"
+        self.broker, self.port, self.qos = broker, port, qos
+        self.reconnect_s = reconnect_s
+        self.line_q = BoundedQueue(line_queue, line_policy)
+        self.pub_q = BoundedQueue(pub_queue, pub_policy)
+        self.reader = FdLineReader(fd, self.line_q)
+        self.spool = DiskSpool(spool_dir, max_bytes=spool_max_bytes)
+        self.pending = PendingTable(MAX_ANCHORS, PENDING_TTL_LINES, PENDING_TTL_MS * 1_000_000)
+        self.poses = PoseRegistry(POSE_FILE)
+        self.clock, self.hdr = WallClock(), HeaderCache()
+        self.connected = False
+        self.n = {"lines": 0, "samples": 0, "published": 0, "spooled": 0, "replayed": 0, "garbage": 0}
+        self.crashed = None
+
+    async def parse_lines(self):
+        line_no, seq = 0, 0
+        while True:
+            t_rx, s = await self.line_q.get()
+            s = s.decode(errors="ignore").strip()
+            line_no += 1
+            self.n["lines"] += 1
+
+            m, field = re_dist.search(s), F_R
+            if not m: m, field = re_azimu.search(s), F_AZ
+            if not m: m, field = re_elev.search(s), F_EL
+            if not m:
+                continue
+            try:
+                value = float(m.group(2))  # [-\d.]+ also matches "-" or "1.2.3" from a corrupted line
+            except ValueError:
+                self.n["garbage"] += 1
+                continue
+            aid = int(m.group(1))
+            done = self.pending.put(aid, field, value, line_no, t_rx)
+            if done is None:
+                continue
+
+            r, az, el = done
+            v_local, v_global = self.poses.vectors(aid, r, az, el, t_rx)
+            sample = {"t_unix_ns": self.clock.to_unix_ns(self.pending.arrival_ns(aid)), "anchor_id": aid}
+            if INCLUDE_LOCAL:  sample["vector_local"]  = {"x": v_local[0],  "y": v_local[1],  "z": v_local[2]}
+            if INCLUDE_GLOBAL: sample["vector_global"] = {"x": v_global[0], "y": v_global[1], "z": v_global[2]}
+            if INCLUDE_RAW:    sample["raw"] = {"distance_m": r, "azimuth_deg": az, "elevation_deg": el}
+            payload = {"device_id": self.device_id, "ts": self.hdr.iso(self.clock.to_unix_ns(t_rx)), "seq": seq, "body": sample}
+            seq += 1
+            self.n["samples"] += 1
+            item = json.dumps(payload).encode()
+            if not self.pub_q.offer(item):
+                await self.pub_q.put(item)
+
+    def _drain_to_spool(self):
+        while not self.pub_q.empty():
+            self.spool.append(self.pub_q.get_nowait()); self.n["spooled"] += 1
+
+    async def _offline(self, seconds: float):
+        """Broker down: keep the publish queue empty by spooling to disk for `seconds`."""
+        deadline = time.monotonic() + seconds
+        while (left := deadline - time.monotonic()) > 0:
+            try:
+                item = await asyncio.wait_for(self.pub_q.get(), left)
+            except asyncio.TimeoutError:
+                break
+            self.spool.append(item); self.n["spooled"] += 1
+            self._drain_to_spool()
+
+    async def _online(self, client: MiniMqttClient):
+        while True:
+            if self.spool.pending():
+                # keep ordering: anything queued behind the backlog joins the spool first
+                self._drain_to_spool()
+                path = self.spool.oldest()
+                for item in self.spool.read(path):
+                    await client.publish(self.topic, item, self.qos)
+                    self.n["replayed"] += 1
+                await client.flush()
+                self.spool.remove(path)
+                continue
+            try:
+                item = await asyncio.wait_for(self.pub_q.get(), 0.5)
+            except asyncio.TimeoutError:
+                if client.lost.is_set():
+                    raise ConnectionError("broker connection lost")
+                continue
+            try:
+                await client.publish(self.topic, item, self.qos)
+            except (OSError, ConnectionError):
+                if not any(x is item for x in client.inflight.values()):  # else re-spooled below
+                    self.spool.append(item); self.n["spooled"] += 1
+                raise
+            self.n["published"] += 1
+
+    async def publish_loop(self):
+        while True:
+            client = MiniMqttClient(f"uartgw-{self.device_id}")
+            try:
+                await client.connect(self.broker, self.port)
+            except (OSError, ConnectionError, asyncio.TimeoutError):
+                await self._offline(self.reconnect_s)
+                continue
+            self.connected = True
+            print(f"Connected to {self.broker}:{self.port}, publishing to {self.topic}")
+            try:
+                await self._online(client)
+            except (OSError, ConnectionError):
+                pass
+            finally:
+                self.connected = False
+                await client.close()
+            # QoS 1 messages the broker never acknowledged go to the spool, not to RAM
+            for item in client.inflight.values():
+                self.spool.append(item); self.n["spooled"] += 1
+            print("Broker connection lost, spooling to disk")
+
+    def stats(self) -> dict:
+        self.pending.sweep(self.n["lines"])  # count anchors that went quiet mid-triple as evicted
+        return {**self.n, "connected": self.connected, "line_q": self.line_q.qsize(), "pub_q": self.pub_q.qsize(),
+                "line_drops": self.line_q.dropped, "pub_drops": self.pub_q.dropped,
+                "reader_paused": self.reader.paused, "garbage": self.n["garbage"] + self.reader.garbage,
+                "spool_bytes": self.spool.total, "spool_dropped_segments": self.spool.dropped_segments,
+                "pending": self.pending.stats()}
+
+    def _task_done(self, task: asyncio.Task):
+        """A worker task must never end on its own: log why and stop the gateway."""
+        if task.cancelled():
+            return
+        exc = task.exception()
+        self.crashed = exc or RuntimeError(f"{task.get_name()} returned")
+        print(f"[!] {task.get_name()} stopped: {self.crashed!r}; stopping gateway")
+        if exc is not None:
+            traceback.print_exception(exc)
+        self.reader.eof.set()  # wakes run()
+
+    async def run(self, stats_every: float = 0.0):
+        self.reader.start()
+        tasks = [asyncio.create_task(self.parse_lines(), name="parse_lines"),
+                 asyncio.create_task(self.publish_loop(), name="publish_loop")]
+        for t in tasks:
+            t.add_done_callback(self._task_done)
+        try:
+            if stats_every > 0:
+                while not self.reader.eof.is_set():
+                    try:
+                        await asyncio.wait_for(self.reader.eof.wait(), stats_every)
+                    except asyncio.TimeoutError:
+                        print(self.stats())
+            await self.reader.eof.wait()
+            # input closed: give what is already queued a moment to get out
+            for _ in range(100):
+                if self.crashed or (self.line_q.empty() and self.pub_q.empty()):
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            self.reader.stop()
+            for t in tasks:
+                t.cancel()
+        if self.crashed:
+            raise RuntimeError("gateway task crashed") from self.crashed
+
+
+# ---------- self test: stand-in broker stopped and started under load ----------
+class StandInBroker:
+    """Tiny local MQTT sink: acks CONNECT/PUBLISH/PINGREQ and records received seq numbers."""
+    def __init__(self):
+        self.seqs = set()
+        self.received = 0
+        self.port = 0
+        self._server = None
+        self._writers = set()
+
+    async def start(self, port: int = 0):
+        self._server = await asyncio.start_server(self._client, "127.0.0.1", port, reuse_address=True)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        for w in list(self._writers):
+            w.close()
+        await self._server.wait_closed()
+
+    async def _client(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while True:
+                hdr, body = await read_packet(reader)
+                kind = hdr >> 4
+                if kind == 1:
+                    writer.write(b"\x20\x02\x00\x00")
+                elif kind == 3:
+                    tlen = struct.unpack("!H", body[:2])[0]
+                    i = 2 + tlen
+                    if (hdr >> 1) & 3:
+                        writer.write(b"\x40\x02" + body[i:i + 2]); i += 2
+                    self.seqs.add(json.loads(body[i:])["seq"])
+                    self.received += 1
+                elif kind == 12:
+                    writer.write(b"\xd0\x00")
+                elif kind == 14:
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, OSError, asyncio.CancelledError):
+            pass  # client gone, broker stopped or loop shutting down
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+async def selftest(rate_hz: float = 1000.0, up_s: float = 3.0, down_s: float = 8.0, qos: int = 1) -> bool:
+    with tempfile.TemporaryDirectory(prefix="uwb_spool_") as spool_dir:
+        return await _selftest(spool_dir, rate_hz, up_s, down_s, qos)
+
+async def _selftest(spool_dir: str, rate_hz: float, up_s: float, down_s: float, qos: int) -> bool:
+    broker = StandInBroker()
+    await broker.start()
+    r_fd, w_fd = os.pipe()
+    os.set_blocking(w_fd, False)
+    gw = Gateway(r_fd, "selftest", "127.0.0.1", broker.port, qos=qos, spool_dir=spool_dir, reconnect_s=0.5)
+    gw_task = asyncio.create_task(gw.run())
+    os.write(w_fd, b"TWR[0].distance : -\n")  # corrupted field line: counted as garbage, parsing goes on
+
+    sent, mem = 0, []
+    async def feed(seconds):
+        nonlocal sent
+        t_end = time.monotonic() + seconds
+        while time.monotonic() < t_end:
+            batch = int(rate_hz / 100)
+            lines = "".join(f"TWR[{k % 4}].distance : 1.{k % 100:02d}\nTWR[{k % 4}].aoa_azimuth : 12.5\n"
+                            f"TWR[{k % 4}].aoa_elevation : -3.0\n" for k in range(sent, sent + batch))
+            data = lines.encode()
+            while data:  # never block the loop that also drains the pipe
+                try:
+                    data = data[os.write(w_fd, data):]
+                except BlockingIOError:
+                    await asyncio.sleep(0.001)
+            sent += batch
+            await asyncio.sleep(0.01)
+            mem.append(rss_bytes())
+
+    await feed(up_s)
+    await broker.stop()
+    print(f"[selftest] broker stopped after {sent} samples")
+    await feed(1.0)
+    mem_outage_start = max(mem[-20:])
+    await feed(down_s - 1.0)
+    mem_outage_end = max(mem[-20:])
+    print(f"[selftest] broker restarted, spool holds {gw.spool.total} B")
+    await broker.start(broker.port)
+    await feed(up_s)
+
+    for _ in range(200):  # let the backlog drain
+        if len(broker.seqs) >= sent:
+            break
+        await asyncio.sleep(0.05)
+    os.close(w_fd)
+    await gw_task
+    await broker.stop()
+    os.close(r_fd)
+
+    growth = mem_outage_end - mem_outage_start
+    lost = sent - len(broker.seqs)
+    print(f"[selftest] generated={sent} delivered_unique={len(broker.seqs)} delivered_total={broker.received}")
+    print(f"[selftest] RSS during outage: {mem_outage_start/1e6:.1f} MB → {mem_outage_end/1e6:.1f} MB "
+          f"({growth/1e3:+.0f} kB), spool peaked on disk instead")
+    print(f"[selftest] {gw.stats()}")
+    ok = lost == 0 and growth < 2_000_000 and gw.crashed is None
+    print("[selftest] PASS" if ok else f"[selftest] FAIL (lost={lost}, growth={growth} B)")
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser(description="asyncio UART → MQTT gateway with bounded queues and disk spool")
+    ap.add_argument("--device-id", default="anchor-01", help="Device id (topic house/anchors/<id>)")
+    ap.add_argument("--broker", default="mqtt-broker.local", help="Broker host/IP")
+    ap.add_argument("--port", type=int, default=1883, help="Broker port")
+    ap.add_argument("--qos", type=int, choices=[0, 1], default=0, help="MQTT QoS")
+    ap.add_argument("--serial", default=os.getenv("SERIAL_PORT", "/dev/ttyUSB0"), help="UART device")
+    ap.add_argument("--baud", type=int, default=int(os.getenv("BAUD", "3000000")), help="UART baud rate")
+    ap.add_argument("--line-queue", type=int, default=4096, help="Max queued UART lines")
+    ap.add_argument("--line-policy", choices=POLICIES, default="drop_oldest", help="Line queue overflow policy")
+    ap.add_argument("--pub-queue", type=int, default=1024, help="Max queued MQTT payloads")
+    ap.add_argument("--pub-policy", choices=POLICIES, default="block", help="Publish queue overflow policy")
+    ap.add_argument("--spool-dir", default="./spool", help="Offline spool folder")
+    ap.add_argument("--spool-max-mb", type=float, default=64, help="Spool size cap (oldest dropped beyond)")
+    ap.add_argument("--stats", type=float, default=5.0, help="Print stats every N s (0 = off)")
+    ap.add_argument("--selftest", action="store_true", help="Broker stop/start demo against a local stand-in broker")
+    args = ap.parse_args()
+
+    if args.selftest:
+        sys.exit(0 if asyncio.run(selftest()) else 1)
+
+    import serial
+    ser = serial.Serial(args.serial, args.baud, timeout=0)
+    gw = Gateway(ser.fileno(), args.device_id, args.broker, args.port, qos=args.qos,
+                 line_queue=args.line_queue, line_policy=args.line_policy,
+                 pub_queue=args.pub_queue, pub_policy=args.pub_policy,
+                 spool_dir=args.spool_dir, spool_max_bytes=int(args.spool_max_mb * 1024 * 1024))
+    print(f"UART {args.serial}@{args.baud}. Gateway → {args.broker}:{args.port} topic {gw.topic}. Ctrl+C to stop.")
+    try:
+        asyncio.run(gw.run(stats_every=args.stats))
+    except KeyboardInterrupt:
+        print("Pending stats:", gw.stats()["pending"])
+    except RuntimeError as e:  # a worker task died, already logged by Gateway._task_done
+        print(f"[!] {e}: {gw.stats()}")
+        sys.exit(1)
+    finally:
+        ser.close()
+
+if __name__ == "__main__":
+    main()
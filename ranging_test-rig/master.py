@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 # master_uart_pub.py — UART→vectors→MQTT (paho v1.x)
-import os, re, json, time, math, serial
-from datetime import datetime
+import os, re, sys, json, time, serial
 import paho.mqtt.client as mqtt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # shared uwb_* modules
+from uwb_pending import PendingTable, F_R, F_AZ, F_EL
+from uwb_timing import WallClock, HeaderCache
+from uwb_poses import PoseRegistry, DEFAULT_POSE_FILE
+
 # === USER INPUT ===
 DEVICE_ID = input("Enter device_id for MASTER: ").strip() or "master-1"
 
@@ -19,44 +23,15 @@ INCLUDE_RAW    = True
 INCLUDE_LOCAL  = True
 INCLUDE_GLOBAL = True
 
-# Anchor orientations (deg): yaw, pitch, roll
-ANCHOR_POSE = {0:(45.0,0.0,0.0), 1:(135.0,0.0,0.0), 2:(-135.0,0.0,0.0), 3:(-45.0,0.0,0.0)}
+POSE_FILE = os.getenv("POSE_FILE", DEFAULT_POSE_FILE)  # anchor yaw/pitch/roll, reloaded on change (uwb_poses.py)
+
+MAX_ANCHORS, PENDING_TTL_LINES, PENDING_TTL_MS = 16, 64, 250  # see uwb_pending.py
 
 # Regex for your 2BP prints
 re_dist  = re.compile(r"TWR\[(\d+)\]\.distance\s*:\s*([-\d.]+)")
 re_azimu = re.compile(r"TWR\[(\d+)\]\.aoa_azimuth\s*:\s*([-\d.]+)")
 re_elev  = re.compile(r"TWR\[(\d+)\]\.aoa_elevation\s*:\s*([-\d.]+)")
 
-def deg2rad(d): return d * math.pi / 180.0
-def r_local_from_az_el(dist_m, az_deg, el_deg):
-    th, ph = deg2rad(az_deg), deg2rad(el_deg)
-    cph, sph, cth, sth = math.cos(ph), math.sin(ph), math.cos(th), math.sin(th)
-    x = dist_m * cph * cth
-    y = -dist_m * cph * sth   # +az right ⇒ -y
-    z = -dist_m * sph         # +el down  ⇒ -z
-    return (x, y, z)
-
-def rot_zyx(yaw, pitch, roll):
-    cy, sy = math.cos(deg2rad(yaw)),   math.sin(deg2rad(yaw))
-    cp, sp = math.cos(deg2rad(pitch)), math.sin(deg2rad(pitch))
-    cr, sr = math.cos(deg2rad(roll)),  math.sin(deg2rad(roll))
-    # Rz * Ry * Rx (inlined)
-    a00,a01,a02 = cy*cp, -sy*cp, -cy*sp
-    a10,a11,a12 = sy*cp,  cy*cp, -sy*sp
-    a20,a21,a22 =     sp,      0,     cp
-    return (
-        (a00, a01*cr - a02*sr, a01*sr + a02*cr),
-        (a10, a11*cr - a12*sr, a11*sr + a12*cr),
-        (a20, a21*cr - a22*sr, a21*sr + a22*cr),
-    )
-
-def apply_R(R, v):
-    return (
-        R[0][0]*v[0] + R[0][1]*v[1] + R[0][2]*v[2],
-        R[1][0]*v[0] + R[1][1]*v[1] + R[1][2]*v[2],
-        R[2][0]*v[0] + R[2][1]*v[1] + R[2][2]*v[2],
-    )
-
 def on_connect(client, userdata, flags, rc):
     print("Connected" if rc == 0 else f"Connect failed rc={rc}")
 
@@ -65,46 +40,57 @@ client.on_connect = on_connect
 client.connect(BROKER_HOST, BROKER_PORT, keepalive=30)
 client.loop_start()
 
-R_anchor = {aid: rot_zyx(*pose) for aid, pose in ANCHOR_POSE.items()}
-pending = {}  # aid -> {"r":..., "az":..., "el":...}
+poses = PoseRegistry(POSE_FILE)  # fused (r,az,el) → local/global per anchor
+pending = PendingTable(MAX_ANCHORS, PENDING_TTL_LINES, PENDING_TTL_MS * 1_000_000)
+line_no = garbage = 0
 seq = 0
+clock, hdr = WallClock(), HeaderCache()  # capture-time stamps, cached "ts" strings
 
 ser = serial.Serial(SERIAL_PORT, BAUD)
 print(f"UART {SERIAL_PORT}@{BAUD}. Publishing to {TOPIC}. Ctrl+C to stop.")
 try:
     while True:
-        s = ser.readline().decode(errors="ignore").strip()
-
-        m = re_dist.search(s);   m and pending.setdefault(int(m.group(1)),{}).__setitem__("r",  float(m.group(2)))
-        m = re_azimu.search(s);  m and pending.setdefault(int(m.group(1)),{}).__setitem__("az", float(m.group(2)))
-        m = re_elev .search(s);  m and pending.setdefault(int(m.group(1)),{}).__setitem__("el", float(m.group(2)))
-
-        # publish when (r,az,el) complete for any anchor
-        for aid, st in list(pending.items()):
-            if all(k in st for k in ("r","az","el")):
-                r, az, el = st["r"], st["az"], st["el"]
-                v_local = r_local_from_az_el(r, az, el)
-                R = R_anchor.get(aid, ((1,0,0),(0,1,0),(0,0,1)))
-                v_global = apply_R(R, v_local)
-
-                sample = {"t_unix_ns": time.time_ns(), "anchor_id": aid}
-                if INCLUDE_LOCAL:
-                    sample["vector_local"]  = {"x": v_local[0],  "y": v_local[1],  "z": v_local[2]}
-                if INCLUDE_GLOBAL:
-                    sample["vector_global"] = {"x": v_global[0], "y": v_global[1], "z": v_global[2]}
-                if INCLUDE_RAW:
-                    sample["raw"] = {"distance_m": r, "azimuth_deg": az, "elevation_deg": el}
-
-                payload = {
-                    "device_id": DEVICE_ID,               # header
-                    "ts": datetime.utcnow().isoformat() + "Z",
-                    "seq": seq,
-                    "body": sample                        # body = your vector sample (unchanged)
-                }
-                client.publish(TOPIC, json.dumps(payload), qos=0, retain=False)
-                seq += 1
-                pending.pop(aid, None)
+        s = ser.readline()
+        t_rx = time.monotonic_ns()  # stamp at arrival, before decoding/parsing
+        s = s.decode(errors="ignore").strip()
+
+        line_no += 1
+
+        done = None
+        m, field = re_dist.search(s), F_R
+        if not m: m, field = re_azimu.search(s), F_AZ
+        if not m: m, field = re_elev.search(s), F_EL
+        if m:
+            try:
+                value = float(m.group(2))  # [-\d.]+ also matches "-" or "1.2.3" from a corrupted line
+            except ValueError:
+                garbage += 1  # skip it, leave the pending partial alone
+            else:
+                aid = int(m.group(1)); done = pending.put(aid, field, value, line_no, t_rx)
+
+        # publish when (r,az,el) complete for this anchor
+        if done is not None:
+            r, az, el = done
+            v_local, v_global = poses.vectors(aid, r, az, el, t_rx)
+
+            sample = {"t_unix_ns": clock.to_unix_ns(pending.arrival_ns(aid)), "anchor_id": aid}
+            if INCLUDE_LOCAL:
+                sample["vector_local"]  = {"x": v_local[0],  "y": v_local[1],  "z": v_local[2]}
+            if INCLUDE_GLOBAL:
+                sample["vector_global"] = {"x": v_global[0], "y": v_global[1], "z": v_global[2]}
+            if INCLUDE_RAW:
+                sample["raw"] = {"distance_m": r, "azimuth_deg": az, "elevation_deg": el}
+
+            payload = {
+                "device_id": DEVICE_ID,               # header
+                "ts": hdr.iso(clock.to_unix_ns(t_rx)),  # triple completed
+                "seq": seq,
+                "body": sample                        # body = your vector sample (unchanged)
+            }
+            client.publish(TOPIC, json.dumps(payload), qos=0, retain=False)
+            seq += 1
 except KeyboardInterrupt:
-    pass
+    pending.sweep(line_no)  # count anchors that went quiet mid-triple as evicted
+    print("Pending stats:", pending.stats(), "garbage lines:", garbage)
 finally:
     client.loop_stop(); client.disconnect(); ser.close()
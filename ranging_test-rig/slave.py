@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 # slave_uart_pub.py — UART→vectors→MQTT (paho v1.x)
-import os, re, json, time, math, serial
-from datetime import datetime
+import os, re, sys, json, time, serial
 import paho.mqtt.client as mqtt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # shared uwb_* modules
+from uwb_pending import PendingTable, F_R, F_AZ, F_EL
+from uwb_timing import WallClock, HeaderCache
+from uwb_poses import PoseRegistry, DEFAULT_POSE_FILE
+
 DEVICE_ID  = input("Enter device_id for SLAVE: ").strip() or "slave-1"
 BROKER_HOST= input("Enter MASTER broker host (default mqtt-broker.local): ").strip() or "mqtt-broker.local"
 BROKER_PORT= 1883
@@ -13,33 +17,14 @@ SERIAL_PORT = os.getenv("SERIAL_PORT", "/dev/ttyUSB0")
 BAUD        = int(os.getenv("BAUD", "3000000"))
 
 INCLUDE_RAW, INCLUDE_LOCAL, INCLUDE_GLOBAL = True, True, True
-ANCHOR_POSE = {0:(45.0,0.0,0.0), 1:(135.0,0.0,0.0), 2:(-135.0,0.0,0.0), 3:(-45.0,0.0,0.0)}
+POSE_FILE = os.getenv("POSE_FILE", DEFAULT_POSE_FILE)  # anchor yaw/pitch/roll, reloaded on change (uwb_poses.py)
+
+MAX_ANCHORS, PENDING_TTL_LINES, PENDING_TTL_MS = 16, 64, 250  # see uwb_pending.py
 
 re_dist  = re.compile(r"TWR\[(\d+)\]\.distance\s*:\s*([-\d.]+)")
 re_azimu = re.compile(r"TWR\[(\d+)\]\.aoa_azimuth\s*:\s*([-\d.]+)")
 re_elev  = re.compile(r"TWR\[(\d+)\]\.aoa_elevation\s*:\s*([-\d.]+)")
 
-def deg2rad(d): return d * 3.141592653589793 / 180.0
-def r_local_from_az_el(r, az, el):
-    th, ph = deg2rad(az), deg2rad(el)
-    cph, sph, cth, sth = math.cos(ph), math.sin(ph), math.cos(th), math.sin(th)
-    return (r*cph*cth, -r*cph*sth, -r*sph)
-
-def rot_zyx(yaw, pitch, roll):
-    cy, sy = math.cos(deg2rad(yaw)),   math.sin(deg2rad(yaw))
-    cp, sp = math.cos(deg2rad(pitch)), math.sin(deg2rad(pitch))
-    cr, sr = math.cos(deg2rad(roll)),  math.sin(deg2rad(roll))
-    a00,a01,a02 = cy*cp, -sy*cp, -cy*sp
-    a10,a11,a12 = sy*cp,  cy*cp, -sy*sp
-    a20,a21,a22 =     sp,      0,     cp
-    return ((a00, a01*cr - a02*sr, a01*sr + a02*cr),
-            (a10, a11*cr - a12*sr, a11*sr + a12*cr),
-            (a20, a21*cr - a22*sr, a21*sr + a22*cr))
-
-def apply_R(R, v): return (R[0][0]*v[0]+R[0][1]*v[1]+R[0][2]*v[2],
-                           R[1][0]*v[0]+R[1][1]*v[1]+R[1][2]*v[2],
-                           R[2][0]*v[0]+R[2][1]*v[1]+R[2][2]*v[2])
-
 def on_connect(c,u,f,rc): print("Connected" if rc==0 else f"Connect failed rc={rc}")
 
 client = mqtt.Client(client_id=f"uartpub-{DEVICE_ID}")
@@ -47,34 +32,44 @@ client.on_connect = on_connect
 client.connect(BROKER_HOST, BROKER_PORT, keepalive=30)
 client.loop_start()
 
-R_anchor = {aid: rot_zyx(*pose) for aid, pose in ANCHOR_POSE.items()}
-pending, seq = {}, 0
+poses = PoseRegistry(POSE_FILE)  # fused (r,az,el) → local/global per anchor
+pending = PendingTable(MAX_ANCHORS, PENDING_TTL_LINES, PENDING_TTL_MS * 1_000_000)
+line_no, seq, garbage = 0, 0, 0
+clock, hdr = WallClock(), HeaderCache()  # capture-time stamps, cached "ts" strings
 ser = serial.Serial(SERIAL_PORT, BAUD)
 print(f"UART {SERIAL_PORT}@{BAUD}. Publishing to {BROKER_HOST} topic {TOPIC}. Ctrl+C to stop.")
 try:
     while True:
-        s = ser.readline().decode(errors="ignore").strip()
-        m = re_dist.search(s);   m and pending.setdefault(int(m.group(1)),{}).__setitem__("r",  float(m.group(2)))
-        m = re_azimu.search(s);  m and pending.setdefault(int(m.group(1)),{}).__setitem__("az", float(m.group(2)))
-        m = re_elev .search(s);  m and pending.setdefault(int(m.group(1)),{}).__setitem__("el", float(m.group(2)))
+        s = ser.readline()
+        t_rx = time.monotonic_ns()  # stamp at arrival, before decoding/parsing
+        s = s.decode(errors="ignore").strip()
+        line_no += 1
+        done = None
+        m, field = re_dist.search(s), F_R
+        if not m: m, field = re_azimu.search(s), F_AZ
+        if not m: m, field = re_elev.search(s), F_EL
+        if m:
+            try:
+                value = float(m.group(2))  # [-\d.]+ also matches "-" or "1.2.3" from a corrupted line
+            except ValueError:
+                garbage += 1  # skip it, leave the pending partial alone
+            else:
+                aid = int(m.group(1)); done = pending.put(aid, field, value, line_no, t_rx)
 
-        for aid, st in list(pending.items()):
-            if all(k in st for k in ("r","az","el")):
-                r, az, el = st["r"], st["az"], st["el"]
-                v_local = r_local_from_az_el(r, az, el)
-                R = R_anchor.get(aid, ((1,0,0),(0,1,0),(0,0,1)))
-                v_global = apply_R(R, v_local)
+        if done is not None:
+            r, az, el = done
+            v_local, v_global = poses.vectors(aid, r, az, el, t_rx)
 
-                sample = {"t_unix_ns": time.time_ns(), "anchor_id": aid}
-                if INCLUDE_LOCAL:  sample["vector_local"]  = {"x": v_local[0],  "y": v_local[1],  "z": v_local[2]}
-                if INCLUDE_GLOBAL: sample["vector_global"] = {"x": v_global[0], "y": v_global[1], "z": v_global[2]}
-                if INCLUDE_RAW:    sample["raw"] = {"distance_m": r, "azimuth_deg": az, "elevation_deg": el}
+            sample = {"t_unix_ns": clock.to_unix_ns(pending.arrival_ns(aid)), "anchor_id": aid}
+            if INCLUDE_LOCAL:  sample["vector_local"]  = {"x": v_local[0],  "y": v_local[1],  "z": v_local[2]}
+            if INCLUDE_GLOBAL: sample["vector_global"] = {"x": v_global[0], "y": v_global[1], "z": v_global[2]}
+            if INCLUDE_RAW:    sample["raw"] = {"distance_m": r, "azimuth_deg": az, "elevation_deg": el}
 
-                payload = {"device_id": DEVICE_ID, "ts": datetime.utcnow().isoformat()+"Z", "seq": seq, "body": sample}
-                client.publish(TOPIC, json.dumps(payload), qos=0, retain=False)
-                seq += 1
-                pending.pop(aid, None)
+            payload = {"device_id": DEVICE_ID, "ts": hdr.iso(clock.to_unix_ns(t_rx)), "seq": seq, "body": sample}
+            client.publish(TOPIC, json.dumps(payload), qos=0, retain=False)
+            seq += 1
 except KeyboardInterrupt:
-    pass
+    pending.sweep(line_no)  # count anchors that went quiet mid-triple as evicted
+    print("Pending stats:", pending.stats(), "garbage lines:", garbage)
 finally:
     client.loop_stop(); client.disconnect(); ser.close()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# broker_loadtest.py — how many slaves at what rate can the broker Pi take?
+#
+# Spawns N simulated slave.py-style publishers (house/anchors/<id>, same JSON header+body),
+# one subscriber on house/anchors/# measuring delivered rate and end-to-end latency, and
+# samples the broker process' CPU / RSS from /proc. Sweeps every combination of
+# --devices × --rates × --qos × --payload × --profiles and writes one CSV row per run.
+#
+# By default each profile starts its own local mosquitto from rpi_broker_host.py (so CPU/RSS
+# can be read); with --broker HOST an existing broker is used instead (add --broker-pid for stats).
+# --replay data/anchors feeds recorded pc_subscriber.py payloads instead of synthetic ones.
+#
+# Publishers run as asyncio tasks in --procs worker processes using the small MQTT client from
+# ranging_test-rig/async_gateway.py, so hundreds of devices don't need hundreds of threads.
+import os, sys, csv, json, glob, time, random, shutil, asyncio, argparse, itertools, subprocess, threading, tempfile
+from concurrent.futures import ProcessPoolExecutor
+import paho.mqtt.client as mqtt
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "ranging_test-rig"))  # MiniMqttClient
+from async_gateway import MiniMqttClient
+from rpi_broker_host import PROFILES, write_config
+
+TOPIC_ROOT = "house/anchors"
+
+
+# ---------- payloads ----------
+def synthetic_body(aid: int):
+    r, az, el = random.uniform(0.5, 6.0), random.uniform(-60, 60), random.uniform(-30, 30)
+    return {"anchor_id": aid,
+            "vector_local": {"x": r, "y": -az / 60, "z": -el / 60},
+            "vector_global": {"x": r, "y": az / 60, "z": -el / 60},
+            "raw": {"distance_m": r, "azimuth_deg": az, "elevation_deg": el}}
+
+def load_replay(folder: str, limit: int = 5000):
+    bodies = []
+    for path in sorted(glob.glob(os.path.join(folder, "**", "*.json"), recursive=True))[:limit]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                p = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if isinstance(p, dict) and isinstance(p.get("body"), dict):
+            bodies.append(p["body"])
+    return bodies
+
+def make_payload(device_id: str, seq: int, body: dict, size: int) -> bytes:
+    body = dict(body, t_unix_ns=time.time_ns())  # publish time → subscriber latency
+    p = {"device_id": device_id, "ts": "", "seq": seq, "body": body}
+    raw = json.dumps(p, separators=(",", ":"))
+    if len(raw) < size:  # pad to the requested payload size
+        p["pad"] = "x" * (size - len(raw) - 9)
+        raw = json.dumps(p, separators=(",", ":"))
+    return raw.encode()
+
+
+# ---------- publishers (worker processes) ----------
+async def _device(host, port, device_id, rate, qos, size, duration, bodies, t_start):
+    """Publish for one simulated device; returns (sent, connect_failed, disconnected)."""
+    client = MiniMqttClient(f"load-{device_id}")
+    topic, sent, period = f"{TOPIC_ROOT}/{device_id}", 0, 1.0 / rate
+    try:
+        await client.connect(host, port)
+    except (OSError, ConnectionError, asyncio.TimeoutError):
+        await client.close()
+        return 0, 1, 0
+    # stagger devices so they don't all fire on the same tick
+    t_next = t_start + random.uniform(0, period)
+    dropped = 0
+    try:
+        while t_next < t_start + duration:
+            await asyncio.sleep(max(0.0, t_next - time.time()))
+            body = bodies[sent % len(bodies)] if bodies else synthetic_body(sent % 4)
+            await client.publish(topic, make_payload(device_id, sent, body, size), qos)
+            sent += 1
+            t_next += period
+        await client.flush()
+        dropped = int(client.lost.is_set())  # broker closed on us after the last publish
+    except (OSError, ConnectionError):
+        dropped = 1
+    finally:
+        await client.close()
+    return sent, 0, dropped
+
+def _publisher_proc(job):
+    """Run one worker's devices; returns (sent, connect_failures, disconnects) summed over them."""
+    host, port, ids, rate, qos, size, duration, bodies, t_start = job
+    async def run():
+        res = await asyncio.gather(*(_device(host, port, d, rate, qos, size, duration, bodies, t_start) for d in ids),
+                                   return_exceptions=True)
+        # anything unexpected still counts against the run instead of vanishing
+        res = [r if isinstance(r, tuple) else (0, 1, 0) for r in res]
+        return tuple(sum(col) for col in zip(*res)) if res else (0, 0, 0)
+    return asyncio.run(run())
+
+
+# ---------- subscriber ----------
+class Subscriber:
+    def __init__(self, host, port, qos):
+        self.received = 0
+        self.lat_ms = []
+        self._lock = threading.Lock()
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=f"load-sub-{os.getpid()}")
+        self.client.on_connect = lambda c, u, f, rc, p=None: c.subscribe(f"{TOPIC_ROOT}/#", qos=qos)
+        self.client.on_message = self._on_message
+        self.client.connect(host, port, keepalive=60)
+        self.client.loop_start()
+
+    def _on_message(self, client, userdata, msg):
+        now = time.time_ns()
+        try:
+            t = json.loads(msg.payload)["body"]["t_unix_ns"]
+        except (ValueError, KeyError, TypeError):
+            return
+        with self._lock:
+            self.received += 1
+            self.lat_ms.append((now - t) / 1e6)
+
+    def reset(self):
+        with self._lock:
+            self.received, self.lat_ms = 0, []
+
+    def stop(self):
+        self.client.loop_stop(); self.client.disconnect()
+
+
+# ---------- broker process stats ----------
+class ProcSampler(threading.Thread):
+    """CPU % and RSS of a pid from /proc, sampled every `every` seconds."""
+    def __init__(self, pid, every=0.5):
+        super().__init__(daemon=True)
+        self.pid, self.every = pid, every
+        self.cpu, self.rss = [], []
+        self._halt = threading.Event()
+
+    def _read(self):
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{self.pid}/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        return int(fields[11]) + int(fields[12]), rss  # utime + stime (ticks)
+
+    def run(self):
+        hz = os.sysconf("SC_CLK_TCK")
+        try:
+            ticks0, _ = self._read(); t0 = time.monotonic()
+            while not self._halt.wait(self.every):
+                ticks, rss = self._read(); t = time.monotonic()
+                self.cpu.append(100.0 * (ticks - ticks0) / hz / (t - t0))
+                self.rss.append(rss)
+                ticks0, t0 = ticks, t
+        except OSError:
+            pass  # process gone
+
+    def stop(self):
+        self._halt.set(); self.join()
+
+
+class LocalBroker:
+    def __init__(self, profile, port):
+        exe = shutil.which("mosquitto")
+        if not exe:
+            sys.exit("[!] mosquitto not found. Install with: sudo apt install -y mosquitto (or use --broker)")
+        # fresh database per run: messages persisted by an earlier run must not skew this one
+        self.persist_dir = tempfile.mkdtemp(prefix="mosq_persist_")
+        self.cfg = write_config(profile, port, "127.0.0.1", self.persist_dir)
+        self.log = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen([exe, "-c", self.cfg], stdout=subprocess.DEVNULL, stderr=self.log)
+        time.sleep(0.5)
+        if self.proc.poll() is not None:  # e.g. an option this mosquitto version rejects, or the port is taken
+            self.log.seek(0)
+            err = self.log.read().decode(errors="replace").strip()
+            self.log.close(); os.remove(self.cfg); shutil.rmtree(self.persist_dir, ignore_errors=True)
+            sys.exit(f"[!] mosquitto ({profile} profile) exited with code {self.proc.returncode}:\n{err}")
+
+    def stop(self):
+        self.proc.terminate()
+        try: self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired: self.proc.kill()
+        self.log.close(); os.remove(self.cfg)
+        shutil.rmtree(self.persist_dir, ignore_errors=True)
+
+
+def percentile(xs, q):
+    if not xs:
+        return float("nan")
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+
+def run_point(args, host, port, pid, n_dev, rate, qos, size, bodies, sub):
+    sub.reset()
+    sampler = ProcSampler(pid) if pid else None
+    if sampler: sampler.start()
+    ids = [f"sim-{i:03d}" for i in range(n_dev)]
+    procs = max(1, min(args.procs, n_dev))
+    t_start = time.time() + 1.0
+    jobs = [(host, port, ids[i::procs], rate, qos, size, args.duration, bodies, t_start) for i in range(procs)]
+    with ProcessPoolExecutor(procs) as pool:
+        res = list(pool.map(_publisher_proc, jobs))
+    sent, conn_fail, disconnects = (sum(col) for col in zip(*res))
+    time.sleep(args.settle)  # let the tail arrive
+    if sampler: sampler.stop()
+
+    with sub._lock:
+        received, lat = sub.received, list(sub.lat_ms)
+    return {
+        "devices": n_dev, "rate_hz": rate, "qos": qos, "payload_b": size,
+        "offered_msg_s": round(n_dev * rate, 1),
+        "sent": sent, "received": received,
+        "connect_failures": conn_fail, "disconnects": disconnects,
+        "delivered_msg_s": round(received / args.duration, 1),
+        "delivery_pct": round(100.0 * received / sent, 2) if sent else 0.0,
+        "lat_p50_ms": round(percentile(lat, 0.50), 2), "lat_p95_ms": round(percentile(lat, 0.95), 2),
+        "lat_p99_ms": round(percentile(lat, 0.99), 2), "lat_max_ms": round(max(lat), 2) if lat else float("nan"),
+        "broker_cpu_avg_pct": round(sum(sampler.cpu) / len(sampler.cpu), 1) if sampler and sampler.cpu else "",
+        "broker_cpu_max_pct": round(max(sampler.cpu), 1) if sampler and sampler.cpu else "",
+        "broker_rss_max_mb": round(max(sampler.rss) / 1e6, 1) if sampler and sampler.rss else "",
+    }
+
+
+def failed_note(row):
+    n, d = row["connect_failures"], row["disconnects"]
+    return f" ({n} connect failed, {d} dropped)" if n or d else ""
+
+def ints(s): return [int(x) for x in s.split(",")]
+def floats(s): return [float(x) for x in s.split(",")]
+
+def main():
+    ap = argparse.ArgumentParser(description="MQTT broker load test with simulated anchor fleets")
+    ap.add_argument("--devices", type=ints, default=[1, 4, 8, 16], help="Comma list of simulated slave counts")
+    ap.add_argument("--rates", type=floats, default=[10, 50, 100], help="Comma list of msgs/s per device")
+    ap.add_argument("--qos", type=ints, default=[0], help="Comma list of QoS levels (0,1)")
+    ap.add_argument("--payload", type=ints, default=[300], help="Comma list of payload sizes in bytes")
+    ap.add_argument("--profiles", default="default,fanin", help=f"Comma list from {sorted(PROFILES)} (local broker only)")
+    ap.add_argument("--broker", default=None, help="Use an existing broker instead of starting mosquitto")
+    ap.add_argument("--broker-pid", type=int, default=None, help="PID of that broker for CPU/RSS stats")
+    ap.add_argument("--port", type=int, default=18830, help="Port (local broker listens here)")
+    ap.add_argument("--duration", type=float, default=10.0, help="Seconds per run")
+    ap.add_argument("--settle", type=float, default=2.0, help="Seconds to wait for stragglers after a run")
+    ap.add_argument("--procs", type=int, default=os.cpu_count() or 1, help="Publisher worker processes")
+    ap.add_argument("--replay", default=None, help="Folder of recorded pc_subscriber.py payloads to replay")
+    ap.add_argument("--out", default="broker_loadtest.csv", help="CSV results file")
+    args = ap.parse_args()
+
+    bodies = load_replay(args.replay) if args.replay else None
+    if args.replay and not bodies:
+        sys.exit(f"[!] no payloads found under {args.replay}")
+    profiles = [None] if args.broker else args.profiles.split(",")
+    rows = []
+
+    with open(args.out, "w", newline="") as f:
+        writer = None
+        for profile in profiles:
+            broker = None
+            if profile is None:
+                host, port, pid = args.broker, args.port, args.broker_pid
+            else:
+                broker = LocalBroker(profile, args.port)
+                host, port, pid = "127.0.0.1", args.port, broker.proc.pid
+            try:
+                for qos in args.qos:
+                    sub = Subscriber(host, port, qos)
+                    time.sleep(0.5)
+                    try:
+                        for n_dev, rate, size in itertools.product(args.devices, args.rates, args.payload):
+                            row = {"profile": profile or "external",
+                                   **run_point(args, host, port, pid, n_dev, rate, qos, size, bodies, sub)}
+                            rows.append(row)
+                            print(f"[{row['profile']:>10}] {n_dev:3d} dev × {rate:g} Hz q{qos} {size} B → "
+                                  f"{row['delivery_pct']:6.2f}% delivered"
+                                  f"{failed_note(row)}, p95 {row['lat_p95_ms']} ms, "
+                                  f"cpu {row['broker_cpu_avg_pct']}%, rss {row['broker_rss_max_mb']} MB")
+                            if writer is None:
+                                writer = csv.DictWriter(f, fieldnames=list(row))
+                                writer.writeheader()
+                            writer.writerow(row); f.flush()
+                    finally:
+                        sub.stop()
+            finally:
+                if broker: broker.stop()
+
+    # per load point: the profile that delivers everything with the lowest p95 latency
+    if len(profiles) > 1:
+        print("\nBest profile per load point (no failed devices, delivery ≥ 99.9%, then lowest p95):")
+        key = lambda r: (r["devices"], r["rate_hz"], r["qos"], r["payload_b"])
+        for point, group in itertools.groupby(sorted(rows, key=key), key=key):
+            # delivery_pct only counts what was sent, so a device that never connected hides behind 100%
+            ok = [r for r in group if r["delivery_pct"] >= 99.9 and not failed_note(r)]
+            best = min(ok, key=lambda r: r["lat_p95_ms"])["profile"] if ok else "none (overloaded)"
+            print(f"  {point[0]:3d} dev × {point[1]:g} Hz q{point[2]} {point[3]} B → {best}")
+    print(f"\nResults: {args.out}")
+
+if __name__ == "__main__":
+    main()
+
+
+## to run (on the broker Pi, stop the system mosquitto first or use another --port):
+# python3 broker_loadtest.py --devices 1,4,8,16,32 --rates 10,50,100 --qos 0,1 --profiles default,fanin,lowlatency
+## against the running master broker from a laptop:
+# python3 broker_loadtest.py --broker mqtt-broker.local --port 1883 --devices 4,8 --rates 50
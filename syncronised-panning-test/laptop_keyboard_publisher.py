@@ -1,16 +1,8 @@
 # laptop_keyboard_publisher.py
-import json, time, argparse
+import json, time, argparse, threading, secrets
 from pynput import keyboard
 import paho.mqtt.client as mqtt
-
-def build_payload(cmd: str, delay_sec: float):
-    now = time.time()
-    return {
-        "cmd": cmd,
-        "execute_at": now + delay_sec,  # schedule a little in the future
-        "sent_at": now,
-        "sender": "laptop"
-    }
+from panning import TOPIC, ALL, build_payload, gains_for, parse_layout, default_width
 
 def on_connect(client, userdata, flags, rc, properties=None):
     if rc == 0:
@@ -21,7 +13,47 @@ def on_connect(client, userdata, flags, rc, properties=None):
 def on_disconnect(client, userdata, rc, properties=None):
     print("[!] Disconnected. Reconnecting…")
 
-def publisher_loop(broker, port, topic, delay):
+class PanStreamer(threading.Thread):
+    """Publishes the latest pan position at most max_rate times a second.
+
+    Key presses only move the target; every update that lands within one interval is
+    coalesced into a single message for the whole group (one message per update,
+    whatever the number of speakers).
+    """
+    def __init__(self, client, topic, delay, group, max_rate, layout=None, width=None):
+        super().__init__(daemon=True)
+        self.client, self.topic, self.delay, self.group = client, topic, delay, group
+        self.interval = 1.0 / max_rate
+        self.layout, self.width = layout, width
+        self.session = secrets.token_hex(4)  # lets listeners tell a restarted publisher from stale seqs
+        self.seq = 0
+        self.pan = 0.0
+        self.dirty = threading.Event()
+        self.lock = threading.Lock()
+
+    def move(self, delta=None, to=None):
+        with self.lock:
+            self.pan = to if to is not None else max(-1.0, min(1.0, self.pan + delta))
+        self.dirty.set()
+
+    def run(self):
+        while True:
+            self.dirty.wait()
+            self.dirty.clear()
+            with self.lock:
+                pan = self.pan
+            self.seq += 1
+            if self.layout:
+                payload = build_payload("gains", self.delay, self.group, self.seq, session=self.session,
+                                        pan=pan, gains=gains_for(pan, self.layout, self.width))
+            else:
+                payload = build_payload("pan", self.delay, self.group, self.seq, session=self.session, pan=pan)
+            self.client.publish(self.topic, json.dumps(payload), qos=1, retain=False)
+            print(f"[->] pan {pan:+.2f} (seq {self.seq}) for group '{self.group}'")
+            time.sleep(self.interval)
+
+def publisher_loop(broker, port, topic, delay, mode="step", group=ALL, pan_step=0.1, max_rate=20.0,
+                   layout=None, width=None):
     client = mqtt.Client(
         mqtt.CallbackAPIVersion.VERSION2,
         client_id="kb-publisher",
@@ -32,24 +64,41 @@ def publisher_loop(broker, port, topic, delay):
     client.connect(broker, port, keepalive=60)
     client.loop_start()
 
+    streamer = None
+    if mode == "pan":
+        streamer = PanStreamer(client, topic, delay, group, max_rate, layout, width)
+        streamer.start()
+
     print("\n--- Keyboard controls ---")
     print("[Enter]  -> start")
-    print("[a]      -> left")
-    print("[d]      -> right")
+    if streamer:
+        print(f"[a]/[d]  -> pan left/right by {pan_step} (≤{max_rate:g} msgs/s, group '{group}')")
+        print("[c]      -> centre")
+    else:
+        print("[a]      -> left")
+        print("[d]      -> right")
     print("[q]      -> quit")
     print("-------------------------\n")
 
     def handle_key(key):
         try:
             if key == keyboard.Key.enter:
-                payload = build_payload("start", delay)
-            elif hasattr(key, 'char') and key.char in ('a', 'd', 'q'):
+                payload = build_payload("start", delay, group)
+            elif hasattr(key, 'char') and key.char in ('a', 'd', 'c', 'q'):
                 if key.char == 'q':
                     print("[*] Quitting…")
                     client.loop_stop()
                     client.disconnect()
                     return False
-                payload = build_payload("left" if key.char == 'a' else "right", delay)
+                if streamer:
+                    if key.char == 'c':
+                        streamer.move(to=0.0)
+                    else:
+                        streamer.move(-pan_step if key.char == 'a' else pan_step)
+                    return True
+                if key.char == 'c':
+                    return True
+                payload = build_payload("left" if key.char == 'a' else "right", delay, group)
             else:
                 return True  # ignore
 
@@ -68,10 +117,22 @@ def main():
     ap = argparse.ArgumentParser(description="Laptop keyboard → MQTT publisher")
     ap.add_argument("--broker", required=True, help="Broker host/IP (Pi #1 IP)")
     ap.add_argument("--port", type=int, default=1883, help="Broker port (default 1883)")
-    ap.add_argument("--topic", default="audio/pan/cmd", help="MQTT topic")
+    ap.add_argument("--topic", default=TOPIC, help="MQTT topic")
     ap.add_argument("--delay", type=float, default=0.5, help="Seconds to schedule in the future")
+    ap.add_argument("--mode", choices=["step", "pan"], default="step",
+                    help="step: legacy left/right volume steps; pan: stream continuous pan positions")
+    ap.add_argument("--group", default=ALL, help="Listener group to address (default: all)")
+    ap.add_argument("--pan-step", type=float, default=0.1, help="Pan change per key press (pan mode)")
+    ap.add_argument("--max-rate", type=float, default=20.0, help="Max pan messages per second (pan mode)")
+    ap.add_argument("--layout", type=parse_layout, default=None,
+                    help="Send per-speaker gain vectors instead, e.g. '1:-1,2:-0.2,3:1' (id:position)")
+    ap.add_argument("--width", type=float, default=None, help="Speaker spacing for --layout (default: even)")
     args = ap.parse_args()
-    publisher_loop(args.broker, args.port, args.topic, args.delay)
+    width = args.width
+    if args.layout and width is None:
+        width = default_width(len(args.layout))
+    publisher_loop(args.broker, args.port, args.topic, args.delay, args.mode, args.group,
+                   args.pan_step, args.max_rate, args.layout, width)
 
 if __name__ == "__main__":
     main()
@@ -80,4 +141,5 @@ if __name__ == "__main__":
 ## to run:
 # python3 -m pip install paho-mqtt pynput
 # python3 laptop_keyboard_publisher.py --broker 172.20.10.9 --port 1883
-
+## continuous pan for any number of listeners in group "room":
+# python3 laptop_keyboard_publisher.py --broker 172.20.10.9 --mode pan --group room --max-rate 20
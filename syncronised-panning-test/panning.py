@@ -0,0 +1,65 @@
+# panning.py — shared pan protocol + equal-power gain law for N speakers
+#
+# Messages on TOPIC (JSON), all scheduled with "execute_at" like the original start/left/right:
+#   {"cmd": "pan",   "group": "room", "pan": -0.25, "seq": 17, "execute_at": ..., "sent_at": ..., "sender": ...}
+#       one continuous position for the whole group; every listener derives its own gain
+#   {"cmd": "gains", "group": "room", "gains": {"1": 0.7, "2": 0.7, "3": 0.0}, "seq": 18, ...}
+#       explicit per-speaker gain vector (uneven layouts); listeners pick their own id
+# "group": "all" (default) reaches every listener. "session" + "seq" let listeners drop stale or
+# reordered updates (a new session, i.e. a restarted publisher, always applies).
+#
+# Speakers sit on a line at positions in [-1, 1] (left … right), spaced `width` apart.
+# A source at `pan` gets gain cos(π/2 · |pan - pos| / width) on each speaker within `width`,
+# so the two speakers bracketing it share power: g_a² + g_b² = 1 at every position.
+#
+# Gains are linear amplitude factors. Listeners set them through `amixer -M`, ALSA's mapped
+# scale, where the percentage is ~ the cube root of the amplitude: volume % = max_volume · g^(1/3)
+# (mixer_percent()), so the speaker amplitude is g times the amplitude at max_volume. Writing g
+# as a plain percentage would give ~g³, i.e. a ~6 dB dip at the centre instead of constant power.
+import math, time
+
+TOPIC = "audio/pan/cmd"
+ALL = "all"
+
+
+def even_positions(n: int):
+    """n speakers spread evenly over [-1, 1] (n=1 → centre)."""
+    if n <= 1:
+        return [0.0]
+    return [-1.0 + 2.0 * i / (n - 1) for i in range(n)]
+
+def default_width(n: int) -> float:
+    return 2.0 / (n - 1) if n > 1 else 2.0
+
+def equal_power_gain(pan: float, position: float, width: float) -> float:
+    d = abs(pan - position) / width
+    return math.cos(0.5 * math.pi * d) if d < 1.0 else 0.0
+
+def mixer_percent(gain: float, max_volume: float) -> int:
+    """amixer -M volume % for a linear amplitude gain in [0, 1] (mapped scale ≈ amplitude^(1/3))."""
+    return int(round(max_volume * max(0.0, min(1.0, gain)) ** (1.0 / 3.0)))
+
+def gains_for(pan: float, layout: dict, width: float) -> dict:
+    """{speaker_id: gain} for a layout {speaker_id: position}."""
+    return {str(sid): round(equal_power_gain(pan, pos, width), 4) for sid, pos in layout.items()}
+
+def parse_layout(spec: str) -> dict:
+    """'1:-1,2:0,3:1' → {'1': -1.0, '2': 0.0, '3': 1.0}"""
+    out = {}
+    for item in spec.split(","):
+        sid, pos = item.split(":")
+        out[sid.strip()] = float(pos)
+    return out
+
+
+def build_payload(cmd: str, delay_sec: float, group: str = ALL, seq: int | None = None, **fields):
+    now = time.time()
+    p = {"cmd": cmd, "group": group, "execute_at": now + delay_sec, "sent_at": now, "sender": "laptop"}
+    if seq is not None:
+        p["seq"] = seq
+    p.update(fields)
+    return p
+
+def addressed_to(payload: dict, group: str) -> bool:
+    g = payload.get("group", ALL)
+    return g == ALL or g == group
@@ -1,23 +1,86 @@
 # rpi_broker_host.py
-import subprocess, shutil, sys, tempfile, textwrap, os
+import subprocess, shutil, sys, tempfile, textwrap, os, argparse
+
+# Tuned mosquitto profiles. Compare them with broker_loadtest.py on the actual Pi
+# (device count × rate × QoS × payload) and pick the one that keeps delivery at 100%
+# with the lowest p95 latency for your setup.
+PROFILES = {
+    # original config: unbounded defaults, no persistence
+    "default": """
+        persistence false
+    """,
+    # many slaves → one subscriber at QoS 0 on an RPi 3B+: small socket writes go out
+    # immediately, per-client queues are capped so a slow subscriber can't eat the RAM
+    "fanin": """
+        persistence false
+        set_tcp_nodelay true
+        max_inflight_messages 40
+        max_queued_messages 2000
+        max_queued_bytes 4000000
+        memory_limit 67108864
+        sys_interval 10
+    """,
+    # latest-value-wins live view: short queues, old data is dropped instead of lagging
+    "lowlatency": """
+        persistence false
+        set_tcp_nodelay true
+        max_inflight_messages 10
+        max_queued_messages 100
+        sys_interval 10
+    """,
+    # QoS 1 with persistence: queued messages survive a broker restart (costs SD-card writes).
+    # The database goes to a folder of the invoking user ({persist_dir}), not the system
+    # broker's /var/lib/mosquitto, which this script cannot write and must not share.
+    "lossless": """
+        persistence true
+        persistence_location {persist_dir}/
+        persistence_file mosquitto-{port}.db
+        autosave_interval 60
+        max_inflight_messages 20
+        max_queued_messages 20000
+        max_queued_bytes 64000000
+    """,
+}
+
+DEFAULT_PERSIST_DIR = os.path.join(os.path.expanduser("~"), ".cache", "uwb-mosquitto")
+
+def build_config(profile: str = "default", port: int = 1883, bind: str = "0.0.0.0",
+                 persist_dir: str = DEFAULT_PERSIST_DIR) -> str:
+    if profile not in PROFILES:
+        raise ValueError(f"unknown profile {profile!r} (choose from {sorted(PROFILES)})")
+    head = f"listener {port} {bind}\nallow_anonymous true\n"
+    body = textwrap.dedent(PROFILES[profile]).strip()
+    return head + body.format(persist_dir=os.path.abspath(persist_dir).rstrip("/"), port=port) + "\n"
+
+def write_config(profile: str = "default", port: int = 1883, bind: str = "0.0.0.0",
+                 persist_dir: str = DEFAULT_PERSIST_DIR) -> str:
+    """Write a temporary mosquitto config, return its path (caller removes it)."""
+    if "{persist_dir}" in PROFILES.get(profile, ""):
+        os.makedirs(persist_dir, exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", delete=False, prefix="mosq_", suffix=".conf") as f:
+        f.write(build_config(profile, port, bind, persist_dir))
+        return f.name
 
 def main():
+    ap = argparse.ArgumentParser(description="Run a local mosquitto broker")
+    ap.add_argument("--profile", choices=sorted(PROFILES), default="default", help="Tuned config profile")
+    ap.add_argument("--port", type=int, default=1883, help="Listener port")
+    ap.add_argument("--persist-dir", default=DEFAULT_PERSIST_DIR, help="Database folder for the lossless profile")
+    ap.add_argument("--show", action="store_true", help="Print the generated config and exit")
+    args = ap.parse_args()
+
+    if args.show:
+        print(build_config(args.profile, args.port, persist_dir=args.persist_dir), end="")
+        return
+
     exe = shutil.which("mosquitto")
     if not exe:
         print("[!] mosquitto not found. Install with: sudo apt install -y mosquitto")
         sys.exit(1)
 
-    conf = textwrap.dedent("""\
-        listener 1883 0.0.0.0
-        allow_anonymous true
-        persistence false
-    """)
-
-    with tempfile.NamedTemporaryFile("w", delete=False, prefix="mosq_", suffix=".conf") as f:
-        f.write(conf)
-        cfg_path = f.name
+    cfg_path = write_config(args.profile, args.port, persist_dir=args.persist_dir)
 
-    print(f"[*] Starting mosquitto with {cfg_path}")
+    print(f"[*] Starting mosquitto ({args.profile} profile) with {cfg_path}")
     print("[*] Press Ctrl+C to stop.")
     try:
         subprocess.run([exe, "-c", cfg_path], check=False)
@@ -36,6 +99,8 @@ if __name__ == "__main__":
 
 # # Terminal A: broker host
 # python3 rpi_broker_host.py
+# # or with a tuned profile (see broker_loadtest.py):
+# python3 rpi_broker_host.py --profile fanin
 
 # # Terminal B: subscriber
 # python3 rpi_listener.py --id 1 --broker 127.0.0.1 --audio /syncronised-panning-test/smooth-ac-guitar-loop.mp3
@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
-import argparse, json, time, subprocess, shutil, sys, re
+import argparse, json, time, subprocess, shutil, sys, re, heapq, threading
 import paho.mqtt.client as mqtt
+from panning import TOPIC, addressed_to, equal_power_gain, even_positions, default_width, mixer_percent
 
-TOPIC = "audio/pan/cmd"
 VOLUME_STEP = 10
 
 def run(cmd):
@@ -54,10 +54,56 @@ class Player:
                 self.proc.kill()
         self.proc = None
 
-def schedule_execute(execute_at: float, fn):
-    delay = execute_at - time.time()
-    if delay > 0: time.sleep(delay)
-    fn()
+class Scheduler(threading.Thread):
+    """Runs commands at their execute_at without blocking the MQTT thread.
+
+    Pan/gain updates are absolute, so when several are due at once (a burst, or amixer
+    was slow) only the newest is applied; other commands all run, in order.
+    """
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.heap = []          # (execute_at, order, is_gain, fn)
+        self.cv = threading.Condition()
+        self.order = 0
+
+    def schedule(self, execute_at: float, fn, is_gain: bool = False):
+        with self.cv:
+            self.order += 1
+            heapq.heappush(self.heap, (execute_at, self.order, is_gain, fn))
+            self.cv.notify()
+
+    def run(self):
+        while True:
+            with self.cv:
+                while not self.heap or self.heap[0][0] > time.time():
+                    self.cv.wait(None if not self.heap else self.heap[0][0] - time.time())
+                now, due = time.time(), []
+                while self.heap and self.heap[0][0] <= now:
+                    due.append(heapq.heappop(self.heap))
+            last_gain = max((d[1] for d in due if d[2]), default=None)
+            for _, order, is_gain, fn in due:
+                if is_gain and order != last_gain:
+                    continue  # superseded by a newer position in the same batch
+                fn()
+
+def apply_gain(node: dict, gain: float, seq, label: str):
+    """Set this node's volume for an equal-power gain in [0, 1]; skips stale seq and no-op writes.
+
+    seq is (publisher session, seq number); a new session (publisher restarted) always applies.
+    """
+    if seq[1] is not None:
+        last = node["last_seq"]
+        if last is not None and last[0] == seq[0] and seq[1] <= last[1]:
+            return
+        node["last_seq"] = seq
+    vol = mixer_percent(gain, node["max_volume"])  # -M scale is ~cube root of amplitude
+    if vol == node["last_vol"]:
+        return
+    if amixer_set(vol, node["mixer"]):
+        node["last_vol"] = vol
+        print(f"[{node['pi_id']}] {label} -> gain {gain:.3f} -> {node['mixer']} {vol}%")
+    else:
+        print(f"[{node['pi_id']}] Could not set volume via amixer on '{node['mixer']}'.")
 
 def handle_cmd(pi_id: int, cmd: str, player: Player, mixer: str):
     current = amixer_get(mixer)
@@ -90,19 +136,42 @@ def on_connect(client, userdata, flags, rc, properties=None):
 def on_message(client, userdata, msg):
     try:
         payload = json.loads(msg.payload.decode("utf-8"))
+        if not addressed_to(payload, userdata["group"]):
+            return
         cmd = payload.get("cmd")
         execute_at = float(payload.get("execute_at", time.time()))
+        seq = (payload.get("session"), payload.get("seq"))
+
+        if cmd == "pan":
+            pan = float(payload["pan"])
+            gain = equal_power_gain(pan, userdata["position"], userdata["width"])
+            userdata["scheduler"].schedule(execute_at,
+                lambda: apply_gain(userdata, gain, seq, f"pan {pan:+.2f}"), is_gain=True)
+            return
+        if cmd == "gains":
+            gain = payload.get("gains", {}).get(str(userdata["pi_id"]))
+            if gain is not None:
+                userdata["scheduler"].schedule(execute_at,
+                    lambda: apply_gain(userdata, float(gain), seq, "gains"), is_gain=True)
+            return
+
         eta_str = time.strftime("%H:%M:%S", time.localtime(execute_at))
         print(f"[->] {cmd} scheduled for {eta_str} (epoch {execute_at:.3f})")
-
-        schedule_execute(execute_at,
-            lambda: handle_cmd(userdata["pi_id"], cmd, userdata["player"], userdata["mixer"]))
+        def legacy():
+            handle_cmd(userdata["pi_id"], cmd, userdata["player"], userdata["mixer"])
+            userdata["last_vol"] = None  # volume changed outside the gain path
+        userdata["scheduler"].schedule(execute_at, legacy)
     except Exception as e:
         print(f"[!] Message handling error: {e}")
 
 def main():
     ap = argparse.ArgumentParser(description="RPi synchronized audio panner")
-    ap.add_argument("--id", type=int, required=True, choices=[1, 2], help="RPi ID (1=left, 2=right)")
+    ap.add_argument("--id", type=int, required=True, help="RPi ID (legacy left/right: 1=left, 2=right)")
+    ap.add_argument("--group", default="all", help="Listener group; only messages for this group or 'all' apply")
+    ap.add_argument("--speakers", type=int, default=2, help="Speakers in the row (for default position/width)")
+    ap.add_argument("--position", type=float, default=None, help="Own pan position in [-1, 1] (default: even spread by id)")
+    ap.add_argument("--width", type=float, default=None, help="Speaker spacing in pan units (default: 2/(speakers-1))")
+    ap.add_argument("--max-volume", type=int, default=70, help="Volume %% at gain 1.0")
     ap.add_argument("--broker", required=True, help="MQTT broker host/IP")
     ap.add_argument("--port", type=int, default=1883, help="MQTT broker port")
     ap.add_argument("--audio", required=True, help="Path to audio file (mp3)")
@@ -111,16 +180,27 @@ def main():
     ap.add_argument("--mixer", default="Headphones", help="Mixer control (Headphones, Master, PCM, etc.)")
     args = ap.parse_args()
 
+    positions = even_positions(args.speakers)
+    position = args.position if args.position is not None else (
+        positions[args.id - 1] if 1 <= args.id <= len(positions) else 0.0)
+    width = args.width if args.width is not None else default_width(args.speakers)
+
     player = Player(args.audio, sink=args.sink, alsa_device=args.alsa_device)
+    scheduler = Scheduler()
+    scheduler.start()
     client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2,
                          client_id=f"rpi-{args.id}",
-                         userdata={"pi_id": args.id, "player": player, "mixer": args.mixer})
+                         userdata={"pi_id": args.id, "player": player, "mixer": args.mixer,
+                                   "group": args.group, "position": position, "width": width,
+                                   "max_volume": args.max_volume, "scheduler": scheduler,
+                                   "last_seq": None, "last_vol": None})
     client.on_connect = on_connect
     client.on_message = on_message
     client.connect(args.broker, args.port, keepalive=60)
 
     print(f"[*] RPi ID={args.id}. Broker={args.broker}:{args.port}")
     print(f"[*] Using sink={args.sink}, mixer={args.mixer}, audio={args.audio}")
+    print(f"[*] Group={args.group}, pan position={position:+.2f}, width={width:.2f}")
     print("[*] Ensure system time is NTP-synced.")
     client.loop_forever()
 
@@ -142,6 +222,11 @@ if __name__ == "__main__":
 
 
 
+## N speakers, continuous pan (e.g. 4 Pis in a row, this one second from the left):
+# python3 rpi_listener.py --id 2 --speakers 4 --group room --broker 172.20.10.9 --audio ...
+
+
+
 ## to run (new) Rpi1:
 # python3 rpi_listener.py --id 1 \
 #   --broker 127.0.0.1 \
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Compressed, time-indexed archive for UWB vector samples.
+
+Samples are streamed into hourly segment files. Every flush compresses the
+buffered samples into one independent block (zlib or lzma, stdlib only) and
+appends a fixed-size record to the segment's block index:
+
+  ./uwb_archive/uwb_20250101_13Z.seg       concatenated compressed blocks
+  ./uwb_archive/uwb_20250101_13Z.seg.idx   (t_first_ns, t_last_ns, offset, length) per block
+
+A time-range query only reads the index of the hours it overlaps, seeks
+straight to the matching blocks and decompresses just those.
+
+Retention: oldest segments are deleted once the archive grows past
+max_bytes, or once a segment is older than max_age_s (either may be None).
+
+usage (query from the shell, prints one JSON sample per line):
+  python3 uwb_archive.py ./uwb_archive --from 2025-01-01T13:00:00 --to 2025-01-01T13:05:00
+"""
+
+import os, re, json, lzma, zlib, time, bisect, struct, itertools, argparse
+from datetime import datetime, timezone
+
+INDEX_REC = struct.Struct("<qqQI")  # t_first_ns, t_last_ns, byte offset, byte length
+SEGMENT_NS = 3600 * 1_000_000_000   # one segment per UTC hour
+
+CODECS = {
+    "zlib": (lambda b: zlib.compress(b, 6), zlib.decompress),
+    "lzma": (lambda b: lzma.compress(b, preset=1), lzma.decompress),
+}
+CODEC_EXT = {"zlib": ".seg", "lzma": ".segx"}
+
+re_segment = re.compile(r"uwb_(\d{8}_\d{2})Z\.(seg|segx)$")
+
+
+def segment_hour_ns(t_ns: int) -> int:
+    return t_ns - (t_ns % SEGMENT_NS)
+
+def segment_stem(hour_ns: int) -> str:
+    dt = datetime.fromtimestamp(hour_ns / 1e9, tz=timezone.utc)
+    return "uwb_" + dt.strftime("%Y%m%d_%H") + "Z"
+
+def parse_segment_hour(name: str):
+    """Hour start (ns) encoded in a segment filename, or None if not a segment."""
+    m = re_segment.match(name)
+    if not m:
+        return None
+    dt = datetime.strptime(m.group(1), "%Y%m%d_%H").replace(tzinfo=timezone.utc)
+    return int(dt.timestamp()) * 1_000_000_000
+
+
+def list_segments(out_dir: str):
+    """[(hour_ns, seg_path, idx_path, codec)] sorted oldest first."""
+    segs = []
+    try:
+        names = os.listdir(out_dir)
+    except FileNotFoundError:
+        return segs
+    for name in names:
+        hour = parse_segment_hour(name)
+        if hour is None:
+            continue
+        codec = "lzma" if name.endswith(".segx") else "zlib"
+        seg = os.path.join(out_dir, name)
+        segs.append((hour, seg, seg + ".idx", codec))
+    segs.sort()
+    return segs
+
+def read_index(idx_path: str):
+    """Block records of one segment. A torn trailing record (crash mid-write) is ignored."""
+    try:
+        with open(idx_path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    n = len(data) // INDEX_REC.size
+    return [INDEX_REC.unpack_from(data, i * INDEX_REC.size) for i in range(n)]
+
+
+class ArchiveWriter:
+    """Append sample blocks to hourly compressed segments, enforcing retention."""
+
+    def __init__(self, out_dir: str, codec: str = "zlib",
+                 max_bytes: int | None = None, max_age_s: float | None = None):
+        if codec not in CODECS:
+            raise ValueError(f"unknown codec {codec!r} (choose from {sorted(CODECS)})")
+        self.out_dir = out_dir
+        self.codec = codec
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self._compress = CODECS[codec][0]
+        self._hour = None
+        self._seg = None
+        self._idx = None
+        os.makedirs(out_dir, exist_ok=True)
+
+    def _open(self, hour_ns: int):
+        self.close()
+        stem = os.path.join(self.out_dir, segment_stem(hour_ns))
+        # append mode: a restart within the same hour keeps extending the segment
+        seg = stem + CODEC_EXT[self.codec]
+        self._seg = open(seg, "ab")
+        self._idx = open(seg + ".idx", "ab")
+        self._hour = hour_ns
+        self.enforce_retention()
+
+    def write_block(self, samples: list) -> int:
+        """Compress samples into one block. Returns compressed size."""
+        if not samples:
+            return 0
+        # samples carry their first field's arrival time and the wall clock re-syncs, so the
+        # buffer is only roughly in time order: index the real bounds, not the ends
+        ts = [s["t_unix_ns"] for s in samples]
+        t_first, t_last = min(ts), max(ts)
+        hour = segment_hour_ns(t_first)
+        if hour != self._hour:
+            self._open(hour)
+
+        raw = "\n".join(json.dumps(s, ensure_ascii=False, separators=(",", ":")) for s in samples)
+        blob = self._compress(raw.encode("utf-8"))
+        offset = self._seg.tell()
+        self._seg.write(blob)
+        self._seg.flush()
+        # index record only after the block is on disk, so the index never points at garbage
+        self._idx.write(INDEX_REC.pack(t_first, t_last, offset, len(blob)))
+        self._idx.flush()
+        return len(blob)
+
+    def enforce_retention(self):
+        """Delete oldest segments (never the open one) past the size / age limits."""
+        if self.max_bytes is None and self.max_age_s is None:
+            return
+        segs = list_segments(self.out_dir)
+        sizes = {seg: sum(os.path.getsize(p) for p in (seg, idx) if os.path.exists(p))
+                 for _, seg, idx, _ in segs}
+        total = sum(sizes.values())
+
+        now_ns = time.time_ns()
+        for hour, seg, idx, _ in segs:
+            if hour == self._hour:
+                break
+            too_old = self.max_age_s is not None and (now_ns - (hour + SEGMENT_NS)) > self.max_age_s * 1e9
+            too_big = self.max_bytes is not None and total > self.max_bytes
+            if not (too_old or too_big):
+                break
+            for p in (seg, idx):
+                try: os.remove(p)
+                except FileNotFoundError: pass
+            total -= sizes[seg]
+            print(f"Archive retention: removed {os.path.basename(seg)}")
+
+    def close(self):
+        for f in (self._seg, self._idx):
+            if f is not None:
+                f.close()
+        self._seg = self._idx = self._hour = None
+
+
+class ArchiveReader:
+    """Time-range queries over an archive directory."""
+
+    def __init__(self, out_dir: str):
+        self.out_dir = out_dir
+
+    def blocks(self, t0_ns: int, t1_ns: int):
+        """Yield (seg_path, codec, offset, length) of blocks overlapping [t0_ns, t1_ns]."""
+        for hour, seg, idx, codec in list_segments(self.out_dir):
+            # a block belongs to the hour of its first sample, so it may spill into the next hour
+            if hour > t1_ns or hour + 2 * SEGMENT_NS < t0_ns:
+                continue
+            recs = read_index(idx)
+            # blocks are appended roughly in time order but may overlap a little: bisect on the
+            # running max of t_last to skip everything ending before t0, then test each block
+            lasts = list(itertools.accumulate((r[1] for r in recs), max))
+            for t_first, t_last, offset, length in recs[bisect.bisect_left(lasts, t0_ns):]:
+                if t_first <= t1_ns and t_last >= t0_ns:
+                    yield seg, codec, offset, length
+
+    def query(self, t0_ns: int, t1_ns: int):
+        """Yield samples with t0_ns <= t_unix_ns <= t1_ns in write order (block by block).
+
+        Blocks are roughly chronological, but samples are not sorted by t_unix_ns within or
+        across blocks (see write_block); sort the result if order matters.
+        """
+        decompress = {name: c[1] for name, c in CODECS.items()}
+        fh, fh_path = None, None
+        try:
+            for seg, codec, offset, length in self.blocks(t0_ns, t1_ns):
+                if seg != fh_path:
+                    if fh: fh.close()
+                    fh, fh_path = open(seg, "rb"), seg
+                fh.seek(offset)
+                raw = decompress[codec](fh.read(length)).decode("utf-8")
+                for line in raw.split("\n"):
+                    s = json.loads(line)
+                    if t0_ns <= s["t_unix_ns"] <= t1_ns:
+                        yield s
+        finally:
+            if fh: fh.close()
+
+
+def parse_time_ns(s: str) -> int:
+    """ISO-8601 (UTC if no offset given) or plain unix seconds → ns."""
+    try:
+        return int(float(s) * 1e9)
+    except ValueError:
+        dt = datetime.fromisoformat(s.rstrip("Z"))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return int(dt.timestamp() * 1e9)
+
+def main():
+    ap = argparse.ArgumentParser(description="Query a UWB vector archive")
+    ap.add_argument("archive_dir", help="Archive directory (e.g. ./uwb_archive)")
+    ap.add_argument("--from", dest="t0", required=True, help="Start time (ISO-8601 UTC or unix seconds)")
+    ap.add_argument("--to", dest="t1", required=True, help="End time (ISO-8601 UTC or unix seconds)")
+    args = ap.parse_args()
+    for s in ArchiveReader(args.archive_dir).query(parse_time_ns(args.t0), parse_time_ns(args.t1)):
+        print(json.dumps(s, ensure_ascii=False, separators=(",", ":")))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Fast columnar loader for recorded anchor data → NumPy.
+
+Understands both recording layouts:
+  ./uwb_json/uwb_vectors_<YYYYmmdd_HHMMSS_mmm>Z.json   (vectorise-2bp-serial.py, list of samples, UTC names)
+  ./data/anchors/<device>/<YYYYmmdd_HHMMSS_mmm>.json   (pc_subscriber.py, one payload per file, local-time names)
+
+The timestamp already in each filename is used to prune by time range (and
+the folder name by device) before anything is opened; the remaining files
+are parsed in parallel with a process pool and concatenated into columns:
+
+  t_unix_ns  int64            anchor   int32
+  device     str              r, az, el float64      (NaN if not recorded)
+  local      float64 (N, 3)   global   float64 (N, 3) (NaN if not recorded)
+
+With cache_dir set, the columns are saved as .npy per selection and
+memory-mapped on reload, so re-opening the same session is instant.
+
+usage:
+  from uwb_loader import load
+  cols = load("./data/anchors", t0="2025-01-01T13:00:00", devices=["anchor-01"], cache_dir="./.uwb_cache")
+  cols["global"][:, 0]  # all global x
+
+dependencies: numpy
+"""
+
+import os, re, json, shutil, hashlib, argparse
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+COLUMNS = ("t_unix_ns", "device", "anchor", "r", "az", "el", "local", "global")
+LOCAL_DEVICE = "local"  # device name given to vectorise-2bp-serial.py recordings (no device_id in them)
+
+re_vectors_file = re.compile(r"uwb_vectors_(\d{8}_\d{6}_\d{3})Z\.json$")
+re_payload_file = re.compile(r"(\d{8}_\d{6}_\d{3})\.json$")
+
+
+def to_ns(t) -> int | None:
+    """None, unix seconds, ns int, datetime or ISO-8601 string (UTC if naive) → ns."""
+    if t is None:
+        return None
+    if isinstance(t, datetime):
+        dt = t
+    elif isinstance(t, str):
+        try:
+            return int(float(t) * 1e9)
+        except ValueError:
+            dt = datetime.fromisoformat(t.rstrip("Z"))
+    elif isinstance(t, int) and t > 10**15:
+        return t
+    else:
+        return int(float(t) * 1e9)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1e9)
+
+def name_time_ns(stamp: str, utc: bool) -> int:
+    dt = datetime.strptime(stamp, "%Y%m%d_%H%M%S_%f")
+    if utc:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1e9)  # naive → local time, as pc_subscriber.py names them
+
+
+def scan(root: str, t0_ns=None, t1_ns=None, devices=None, slack_s: float = 2.0, max_lag_s: float | None = None):
+    """[(path, device)] under root, pruned by filename time and device. Sorted by time.
+
+    max_lag_s: longest delay between a sample and pc_subscriber.py receiving it. None (default)
+    never prunes payload files by t1, since spooled payloads replayed after an outage are named
+    minutes or hours after their samples.
+    """
+    slack = int(slack_s * 1e9)
+    lag = None if max_lag_s is None else int(max_lag_s * 1e9)
+    want = None if devices is None else set(devices)
+    found = []
+
+    def keep_vectors(t_ns):
+        # named at file-window open (vectorise restarts an idle window, so a name is at most
+        # FILE_MAX_SECONDS before its samples); allow slack either side
+        return (t0_ns is None or t_ns + slack >= t0_ns) and (t1_ns is None or t_ns - slack <= t1_ns)
+
+    def keep_payload(t_ns):
+        # named at receive time, which is never before the sample: a name before t0 is safe to
+        # drop, a name after t1 only with a known maximum lag
+        return ((t0_ns is None or t_ns + slack >= t0_ns) and
+                (t1_ns is None or lag is None or t_ns - lag - slack <= t1_ns))
+
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in filenames:
+            m = re_vectors_file.match(name)
+            if m:
+                if (want is None or LOCAL_DEVICE in want) and keep_vectors(name_time_ns(m.group(1), utc=True)):
+                    found.append((name_time_ns(m.group(1), utc=True), os.path.join(dirpath, name), LOCAL_DEVICE))
+                continue
+            m = re_payload_file.match(name)
+            if m:
+                device = os.path.basename(dirpath)
+                if (want is None or device in want) and keep_payload(name_time_ns(m.group(1), utc=False)):
+                    found.append((name_time_ns(m.group(1), utc=False), os.path.join(dirpath, name), device))
+    found.sort()
+    return [(path, device) for _, path, device in found]
+
+
+def _vec(d, nan=float("nan")):
+    if not d:
+        return (nan, nan, nan)
+    return (d.get("x", nan), d.get("y", nan), d.get("z", nan))
+
+def _parse_chunk(items):
+    """Worker: parse a list of (path, device) into column arrays."""
+    nan = float("nan")
+    t, dev, aid, r, az, el, loc, glo = [], [], [], [], [], [], [], []
+    for path, device in items:
+        try:
+            with open(path, "rb") as f:
+                data = json.loads(f.read())
+        except (OSError, ValueError):
+            continue  # half-written / corrupt file: skip, same as the recorders do on error
+        if isinstance(data, dict):  # pc_subscriber payload: header + body
+            device = str(data.get("device_id", device))
+            data = [data.get("body") or {}]
+        for s in data:
+            raw = s.get("raw") or {}
+            t.append(s.get("t_unix_ns", 0))
+            dev.append(device)
+            aid.append(s.get("anchor_id", -1))
+            r.append(raw.get("distance_m", nan))
+            az.append(raw.get("azimuth_deg", nan))
+            el.append(raw.get("elevation_deg", nan))
+            loc.append(_vec(s.get("vector_local")))
+            glo.append(_vec(s.get("vector_global")))
+    return {
+        "t_unix_ns": np.array(t, dtype=np.int64),
+        "device": np.array(dev, dtype=str),
+        "anchor": np.array(aid, dtype=np.int32),
+        "r": np.array(r, dtype=np.float64),
+        "az": np.array(az, dtype=np.float64),
+        "el": np.array(el, dtype=np.float64),
+        "local": np.array(loc, dtype=np.float64).reshape(-1, 3),
+        "global": np.array(glo, dtype=np.float64).reshape(-1, 3),
+    }
+
+def _concat(parts):
+    if not parts:
+        return _parse_chunk([])
+    out = {}
+    for k in COLUMNS:
+        arrs = [p[k] for p in parts]
+        if k == "device":  # widen to the longest name before joining
+            width = max(a.dtype.itemsize // 4 for a in arrs) or 1
+            arrs = [a.astype(f"<U{width}") for a in arrs]
+        out[k] = np.concatenate(arrs)
+    return out
+
+
+def _cache_key(files, t0_ns, t1_ns):
+    h = hashlib.sha1(f"{t0_ns}:{t1_ns}".encode())
+    for path, device in files:
+        st = os.stat(path)
+        h.update(f"{path}\0{device}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()[:16]
+
+def _cache_load(folder):
+    try:
+        return {k: np.load(os.path.join(folder, k + ".npy"), mmap_mode="r") for k in COLUMNS}
+    except FileNotFoundError:
+        return None
+
+def _cache_save(folder, cols):
+    tmp = folder + ".tmp"
+    os.makedirs(tmp, exist_ok=True)
+    for k in COLUMNS:
+        np.save(os.path.join(tmp, k + ".npy"), cols[k])
+    shutil.rmtree(folder, ignore_errors=True)  # stale / partial entry under the same key
+    os.replace(tmp, folder)
+
+
+def load(root: str, t0=None, t1=None, devices=None, workers: int | None = None,
+         chunk_files: int = 256, cache_dir: str | None = None, slack_s: float = 2.0,
+         max_lag_s: float | None = None):
+    """Load every sample under root into columns (dict of NumPy arrays), sorted by time.
+
+    t0/t1 bound t_unix_ns (inclusive), devices limits folders / device_id, and
+    cache_dir enables the memory-mapped .npy cache (columns are then read-only).
+    max_lag_s opts in to pruning payload files named after t1 (see scan()).
+    """
+    t0_ns, t1_ns = to_ns(t0), to_ns(t1)
+    files = scan(root, t0_ns, t1_ns, devices, slack_s, max_lag_s)
+
+    folder = None
+    if cache_dir is not None:
+        folder = os.path.join(cache_dir, _cache_key(files, t0_ns, t1_ns))
+        cols = _cache_load(folder)
+        if cols is not None:
+            return cols
+
+    chunks = [files[i:i + chunk_files] for i in range(0, len(files), chunk_files)]
+    if len(chunks) <= 1 or workers == 1:
+        parts = [_parse_chunk(c) for c in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_parse_chunk, chunks))
+    cols = _concat(parts)
+
+    # exact time / device filter (filename pruning is only approximate), then time order
+    keep = np.ones(len(cols["t_unix_ns"]), dtype=bool)
+    if t0_ns is not None: keep &= cols["t_unix_ns"] >= t0_ns
+    if t1_ns is not None: keep &= cols["t_unix_ns"] <= t1_ns
+    if devices is not None: keep &= np.isin(cols["device"], list(devices))
+    order = np.argsort(cols["t_unix_ns"][keep], kind="stable")
+    cols = {k: v[keep][order] for k, v in cols.items()}
+
+    if folder is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        _cache_save(folder, cols)
+        return _cache_load(folder)
+    return cols
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Load recorded anchor data into NumPy columns")
+    ap.add_argument("root", help="uwb_json/ or data/anchors/ folder")
+    ap.add_argument("--from", dest="t0", default=None, help="Start time (ISO-8601 UTC or unix seconds)")
+    ap.add_argument("--to", dest="t1", default=None, help="End time (ISO-8601 UTC or unix seconds)")
+    ap.add_argument("--device", action="append", default=None, help="Device id (repeatable)")
+    ap.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count)")
+    ap.add_argument("--cache", default=None, help="Cache folder for memory-mapped reloads")
+    ap.add_argument("--max-lag", type=float, default=None,
+                    help="Max s between a sample and its receipt; prunes payload files named after --to")
+    args = ap.parse_args()
+
+    cols = load(args.root, args.t0, args.t1, args.device, workers=args.workers, cache_dir=args.cache,
+                max_lag_s=args.max_lag)
+    n = len(cols["t_unix_ns"])
+    print(f"{n} samples, devices={sorted(set(cols['device'].tolist()))}")
+    if n:
+        print(f"t: {cols['t_unix_ns'][0]} … {cols['t_unix_ns'][-1]} ns")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Rate-limited live monitor for the 2BP UART stream.
+
+Parses every line at full speed but only redraws a compact per-anchor view
+FPS times a second, so a slow terminal (SSH) can never back up the serial
+buffer and hide the drops we are looking for:
+
+  anchor | r / az / el (latest) | r / az / el (avg) | rate Hz
+  lines/s, other lines, garbage lines, kernel UART overruns (when the driver reports them)
+  optional raw tail: every TAIL_EVERY-th line, last TAIL lines
+
+usage:
+  python3 uwb_monitor.py --port /dev/ttyUSB0 --fps 4 --tail 10 --tail-every 50
+
+dependencies: pyserial
+"""
+
+import os, re, sys, time, array, fcntl, argparse
+from collections import deque
+
+re_field = re.compile(r"TWR\[(\d+)\]\.(distance|aoa_azimuth|aoa_elevation)\s*:\s*([-\d.]+)")
+FIELD_IDX = {"distance": 0, "aoa_azimuth": 1, "aoa_elevation": 2}
+
+TIOCGICOUNT = 0x545D  # linux: struct serial_icounter_struct (cts dsr rng dcd rx tx frame overrun parity brk buf_overrun …)
+
+
+def uart_overruns(fd: int):
+    """(hw overrun, tty buffer overrun) counters from the kernel, or None if the driver has none."""
+    buf = array.array("i", [0] * 20)
+    try:
+        fcntl.ioctl(fd, TIOCGICOUNT, buf, True)
+    except OSError:
+        return None
+    return buf[7], buf[10]
+
+
+class AnchorStat:
+    __slots__ = ("last", "avg", "n", "hz", "seen")
+
+    def __init__(self):
+        self.last = [None, None, None]
+        self.avg = [None, None, None]
+        self.n = 0        # distance lines since last frame
+        self.hz = 0.0
+        self.seen = 0.0
+
+
+class Monitor:
+    def __init__(self, fps: float = 4.0, tail: int = 0, tail_every: int = 1, alpha: float = 0.1,
+                 out=sys.stdout, overruns=None):
+        self.frame_ns = int(1e9 / fps)
+        self.tail = deque(maxlen=tail) if tail else None
+        self.tail_every = max(1, tail_every)
+        self.alpha = alpha
+        self.out = out
+        self.overruns = overruns     # callable → (hw, buf) or None
+        self.anchors = {}
+        self.lines = self.other = self.garbage = 0
+        self._lines_at_frame = 0
+        self._lps = 0.0
+        self._last_frame = time.monotonic_ns()
+        self._overrun0 = overruns() if overruns else None
+
+    def feed(self, line: bytes, t_rx: int):
+        """Account one raw line (no trailing newline) that arrived at monotonic t_rx."""
+        self.lines += 1
+        if self.tail is not None and self.lines % self.tail_every == 0:
+            self.tail.append(line)
+        s = line.decode(errors="replace")
+        m = re_field.search(s)
+        if not m:
+            if "�" in s or any(c < " " and c not in "\r\t" for c in s):
+                self.garbage += 1
+            elif s.strip():
+                self.other += 1
+            return
+        try:
+            v = float(m.group(3))  # [-\d.]+ also matches "-" or "1.2.3" from a corrupted line
+        except ValueError:
+            self.garbage += 1
+            return
+        aid, k = int(m.group(1)), FIELD_IDX[m.group(2)]
+        st = self.anchors.get(aid)
+        if st is None:
+            st = self.anchors[aid] = AnchorStat()
+        st.last[k] = v
+        a = st.avg[k]
+        st.avg[k] = v if a is None else a + self.alpha * (v - a)
+        st.seen = t_rx
+        if k == 0:
+            st.n += 1
+
+    def due(self, now_ns: int) -> bool:
+        return now_ns - self._last_frame >= self.frame_ns
+
+    def render(self, now_ns: int):
+        dt = max(1e-9, (now_ns - self._last_frame) / 1e9)
+        self._last_frame = now_ns
+        self._lps = (self.lines - self._lines_at_frame) / dt
+        self._lines_at_frame = self.lines
+
+        def f(v, w=7, p=2): return f"{v:{w}.{p}f}" if v is not None else " " * (w - 1) + "-"
+        rows = ["\x1b[H\x1b[J"  # home + clear: one write per frame
+                f"UWB monitor  lines/s {self._lps:8.0f}  lines {self.lines}  other {self.other}  garbage {self.garbage}"
+                f"  overruns {self._overrun_text()}",
+                "",
+                " id |   r m    az°    el° (latest) |   r m    az°    el° (avg) |  rate Hz | age s"]
+        for aid in sorted(self.anchors):
+            st = self.anchors[aid]
+            st.hz = st.n / dt if st.hz == 0 else st.hz + 0.3 * (st.n / dt - st.hz)
+            st.n = 0
+            rows.append(f"{aid:3d} | {f(st.last[0])}{f(st.last[1])}{f(st.last[2])}          "
+                        f"| {f(st.avg[0])}{f(st.avg[1])}{f(st.avg[2])}       | {st.hz:8.1f} | {(now_ns - st.seen) / 1e9:5.1f}")
+        if self.tail is not None:
+            rows += ["", f"raw tail (1 in {self.tail_every} lines):"]
+            rows += [l.decode(errors="replace")[:160] for l in self.tail]
+        self.out.write("\n".join(rows) + "\n")
+        self.out.flush()
+
+    def _overrun_text(self):
+        if not self.overruns or self._overrun0 is None:
+            return "n/a"
+        hw, buf = self.overruns()
+        return f"{hw - self._overrun0[0]} hw / {buf - self._overrun0[1]} buf"
+
+
+def run(port: str, baud: int, fps: float = 4.0, tail: int = 0, tail_every: int = 1):
+    import serial
+    ser = serial.Serial(port, baud, timeout=0.05)
+    mon = Monitor(fps, tail, tail_every, overruns=lambda: uart_overruns(ser.fileno()))
+    pending = b""
+    try:
+        while True:
+            data = ser.read(ser.in_waiting or 1)  # whole chunks, not readline(): keep up at 3 Mbaud
+            t_rx = time.monotonic_ns()
+            if data:
+                lines = (pending + data).split(b"\n")
+                pending = lines.pop()
+                for line in lines:
+                    mon.feed(line.rstrip(b"\r"), t_rx)
+            if mon.due(t_rx):
+                mon.render(t_rx)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ser.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Rate-limited live 2BP UART monitor")
+    ap.add_argument("--port", default=os.getenv("SERIAL_PORT", "/dev/ttyUSB0"), help="UART device")
+    ap.add_argument("--baud", type=int, default=int(os.getenv("BAUD", "3000000")), help="UART baud rate")
+    ap.add_argument("--fps", type=float, default=4.0, help="View refreshes per second")
+    ap.add_argument("--tail", type=int, default=0, help="Show the last N sampled raw lines (0 = off)")
+    ap.add_argument("--tail-every", type=int, default=1, help="Sample every Nth raw line into the tail")
+    args = ap.parse_args()
+    run(args.port, args.baud, args.fps, args.tail, args.tail_every)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Bounded pending-triple table for the 2BP UART parsers.
+
+The SR150 prints distance, azimuth and elevation of one ranging result on
+separate lines, so each anchor has a partial (r, az, el) until the last of
+the three arrives. This table keeps those partials in fixed-size arrays
+indexed by anchor id with a field bitmask:
+
+  - put() is O(1) and returns the finished (r, az, el) as soon as the mask is full
+  - a partial older than ttl_lines parsed lines (or ttl_ns) is evicted instead of
+    being paired with a fresh field many frames later
+  - a field that arrives twice before the triple completes (lost / corrupted line
+    in between) is a mismatch: the old partial is dropped and restarted
+
+Per-anchor counters (completed / evicted / mismatched / out of range) are kept
+for diagnostics, see stats().
+"""
+
+import time
+
+F_R, F_AZ, F_EL = 1, 2, 4
+F_ALL = F_R | F_AZ | F_EL
+
+
+class PendingTable:
+    def __init__(self, capacity: int = 16, ttl_lines: int | None = 64, ttl_ns: int | None = 250_000_000):
+        self.capacity = capacity
+        self.ttl_lines = ttl_lines
+        self.ttl_ns = ttl_ns
+        self.mask = [0] * capacity
+        self.vals = [[0.0, 0.0, 0.0] for _ in range(capacity)]  # r, az, el
+        self.first_line = [0] * capacity
+        self.first_ns = [0] * capacity
+        self.completed = [0] * capacity
+        self.evicted = [0] * capacity
+        self.mismatched = [0] * capacity
+        self.out_of_range = 0
+
+    def _stale(self, aid: int, line: int, t_ns: int) -> bool:
+        return ((self.ttl_lines is not None and line - self.first_line[aid] > self.ttl_lines) or
+                (self.ttl_ns is not None and t_ns - self.first_ns[aid] > self.ttl_ns))
+
+    def put(self, aid: int, field: int, value: float, line: int, t_ns: int | None = None):
+        """Store one field (F_R / F_AZ / F_EL) for anchor aid, seen on parsed line number `line`
+        at monotonic time t_ns (defaults to now).
+
+        Returns (r, az, el) when this completes the triple, else None.
+        """
+        if not 0 <= aid < self.capacity:
+            self.out_of_range += 1
+            return None
+        if t_ns is None:
+            t_ns = time.monotonic_ns()
+
+        m = self.mask[aid]
+        if m:
+            if self._stale(aid, line, t_ns):
+                self.evicted[aid] += 1
+                m = 0
+            elif m & field:
+                self.mismatched[aid] += 1
+                m = 0
+        if not m:
+            self.first_line[aid] = line
+            self.first_ns[aid] = t_ns
+
+        v = self.vals[aid]
+        v[field >> 1] = value  # F_R→0, F_AZ→1, F_EL→2
+        m |= field
+        if m == F_ALL:
+            self.mask[aid] = 0
+            self.completed[aid] += 1
+            return (v[0], v[1], v[2])
+        self.mask[aid] = m
+        return None
+
+    def arrival_ns(self, aid: int) -> int:
+        """t_ns of the first field of aid's latest triple, i.e. when the measurement arrived."""
+        return self.first_ns[aid]
+
+    def sweep(self, line: int, t_ns: int | None = None) -> int:
+        """Evict every stale partial now (put() only evicts lazily). Returns how many."""
+        if t_ns is None:
+            t_ns = time.monotonic_ns()
+        n = 0
+        for aid in range(self.capacity):
+            if self.mask[aid] and self._stale(aid, line, t_ns):
+                self.mask[aid] = 0
+                self.evicted[aid] += 1
+                n += 1
+        return n
+
+    def stats(self) -> dict:
+        """{anchor_id: {"completed", "evicted", "mismatched"}} for anchors seen so far."""
+        out = {
+            aid: {"completed": self.completed[aid], "evicted": self.evicted[aid], "mismatched": self.mismatched[aid]}
+            for aid in range(self.capacity)
+            if self.completed[aid] or self.evicted[aid] or self.mismatched[aid] or self.mask[aid]
+        }
+        if self.out_of_range:
+            out["out_of_range"] = self.out_of_range
+        return out
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Equivalence check + benchmark for uwb_poses.py against the per-script
+transform code it replaced (kept verbatim below as the reference).
+
+  --check   fused kernels (exact and LUT) vs the old r_local_from_az_el + apply_R(rot_zyx),
+            rotation matrices orthonormal, hot reload (change / malformed file)
+  --bench   ns per sample: old path vs registry exact vs registry LUT
+
+The old rot_zyx only matches the documented Rz(yaw) @ Ry(pitch) @ Rx(roll) for
+yaw-only poses (all shipped poses are): its pitch term is not a rotation and its
+roll turns the wrong way. Equivalence is therefore checked on yaw-only poses and
+the new matrices are checked for orthonormality instead.
+
+usage:
+  python3 uwb_pose_bench.py --check --bench --n 200000
+
+Exit status 1 if a check fails.
+"""
+
+import os, sys, json, math, time, random, argparse, tempfile
+
+from uwb_poses import PoseRegistry, DEFAULT_POSES, LUT_STEP_DEG, D2R, rot_zyx
+
+
+# ---- reference: the code as it was in vectorise-2bp-serial.py / master.py / slave.py ----
+def deg2rad(d): return d * math.pi / 180.0
+
+def old_r_local_from_az_el(dist_m, az_deg, el_deg):
+    th, ph = deg2rad(az_deg), deg2rad(el_deg)
+    cph, sph, cth, sth = math.cos(ph), math.sin(ph), math.cos(th), math.sin(th)
+    return (dist_m * cph * cth, -dist_m * cph * sth, -dist_m * sph)
+
+def old_rot_zyx_vectorise(yaw_deg, pitch_deg, roll_deg):
+    cy, sy = math.cos(deg2rad(yaw_deg)),   math.sin(deg2rad(yaw_deg))
+    cp, sp = math.cos(deg2rad(pitch_deg)), math.sin(deg2rad(pitch_deg))
+    cr, sr = math.cos(deg2rad(roll_deg)),  math.sin(deg2rad(roll_deg))
+    r00 = cy;  r01 = -sy; r02 = 0.0
+    r10 = sy;  r11 =  cy; r12 = 0.0
+    r20 = 0.0; r21 = 0.0; r22 = 1.0
+    RzRy = (
+        r00*cp + r02*sp,     r01*cp + r02*0,     -r00*sp + r02*cp,
+        r10*cp + r12*sp,     r11*cp + r12*0,     -r10*sp + r12*cp,
+        r20*cp + r22*sp,     r21*cp + r22*0,     -r20*sp + r22*cp,
+    )
+    a00,a01,a02,a10,a11,a12,a20,a21,a22 = RzRy
+    return ((a00, a01*cr - a02*sr, a01*sr + a02*cr),
+            (a10, a11*cr - a12*sr, a11*sr + a12*cr),
+            (a20, a21*cr - a22*sr, a21*sr + a22*cr))
+
+def old_rot_zyx_inline(yaw, pitch, roll):
+    cy, sy = math.cos(deg2rad(yaw)),   math.sin(deg2rad(yaw))
+    cp, sp = math.cos(deg2rad(pitch)), math.sin(deg2rad(pitch))
+    cr, sr = math.cos(deg2rad(roll)),  math.sin(deg2rad(roll))
+    a00,a01,a02 = cy*cp, -sy*cp, -cy*sp
+    a10,a11,a12 = sy*cp,  cy*cp, -sy*sp
+    a20,a21,a22 =     sp,      0,     cp
+    return ((a00, a01*cr - a02*sr, a01*sr + a02*cr),
+            (a10, a11*cr - a12*sr, a11*sr + a12*cr),
+            (a20, a21*cr - a22*sr, a21*sr + a22*cr))
+
+def old_apply_R(R, v):
+    return (R[0][0]*v[0] + R[0][1]*v[1] + R[0][2]*v[2],
+            R[1][0]*v[0] + R[1][1]*v[1] + R[1][2]*v[2],
+            R[2][0]*v[0] + R[2][1]*v[1] + R[2][2]*v[2])
+# ---- end reference ----
+
+
+def triples(n, seed=1, grid=None):
+    """n random (aid, r, az, el) in the SR150 range; angles on a step grid if given, else 0.01° prints."""
+    rnd = random.Random(seed)
+    out = []
+    for _ in range(n):
+        az, el = rnd.uniform(-180.0, 180.0), rnd.uniform(-90.0, 90.0)
+        if grid:
+            az, el = round(az / grid) * grid, round(el / grid) * grid
+        else:
+            az, el = round(az, 2), round(el, 2)
+        out.append((rnd.randrange(6), round(rnd.uniform(0.1, 30.0), 3), az, el))  # ids 4, 5 have no pose
+    return out
+
+
+def max_err(reg, R_old, samples):
+    worst = 0.0
+    for aid, r, az, el in samples:
+        loc, glob = reg.vectors(aid, r, az, el)
+        v = old_r_local_from_az_el(r, az, el)
+        g = old_apply_R(R_old.get(aid, ((1,0,0),(0,1,0),(0,0,1))), v)
+        worst = max(worst, *(abs(a - b) for a, b in zip(loc + glob, v + g)))
+    return worst
+
+
+def check(n: int) -> bool:
+    ok = True
+    def report(name, passed, detail=""):
+        nonlocal ok
+        ok &= passed
+        print(f"[check] {'ok  ' if passed else 'FAIL'} {name} {detail}")
+
+    rnd = random.Random(7)
+    poses = [(rnd.uniform(-180, 180), rnd.uniform(-90, 90), rnd.uniform(-180, 180)) for _ in range(500)]
+
+    # the two old rot_zyx copies are the same matrix written two ways
+    d = max(abs(a - b) for p in poses for ra, rb in zip(old_rot_zyx_vectorise(*p), old_rot_zyx_inline(*p))
+            for a, b in zip(ra, rb))
+    report("old rot_zyx copies agree", d < 1e-12, f"(max |Δ| {d:.1e})")
+
+    # new R: orthonormal for any pose, equal to the old one for yaw-only poses
+    def ortho_err(R):
+        return max(abs(sum(R[i][k] * R[j][k] for k in range(3)) - (i == j)) for i in range(3) for j in range(3))
+    d = max(ortho_err(rot_zyx(*p)) for p in poses)
+    report("rot_zyx orthonormal", d < 1e-12, f"(max |RRᵀ-I| {d:.1e})")
+    d = max(ortho_err(old_rot_zyx_inline(*p)) for p in poses)
+    print(f"[check] note old rot_zyx with pitch ≠ 0: max |RRᵀ-I| {d:.2f} (not a rotation)")
+    d = max(abs(a - b) for y, _, rl in poses for ra, rb in zip(rot_zyx(y, 0.0, -rl), old_rot_zyx_inline(y, 0.0, rl))
+            for a, b in zip(ra, rb))
+    print(f"[check] note old rot_zyx at pitch 0 == new with roll negated (max |Δ| {d:.1e}): old roll turned CW")
+    d = max(abs(a - b) for y, _, _ in poses for ra, rb in zip(rot_zyx(y, 0.0, 0.0), old_rot_zyx_inline(y, 0.0, 0.0))
+            for a, b in zip(ra, rb))
+    report("rot_zyx == old for yaw-only poses", d < 1e-12, f"(max |Δ| {d:.1e})")
+
+    # fused kernels vs the old per-sample path, shipped poses + random yaws
+    rnd_poses = {aid: (rnd.uniform(-180, 180), 0.0, 0.0) for aid in range(4)}
+    for label, pose_set in (("shipped poses", DEFAULT_POSES), ("random yaw", rnd_poses)):
+        R_old = {aid: old_rot_zyx_inline(*p) for aid, p in pose_set.items()}
+        exact = PoseRegistry(None, poses=pose_set)
+        lut = PoseRegistry(None, poses=pose_set, lut_step_deg=LUT_STEP_DEG)
+        d = max_err(exact, R_old, triples(n))
+        report(f"exact kernel, {label}", d < 1e-9, f"(max |Δ| {d:.1e} m)")
+        d = max_err(lut, R_old, triples(n, grid=LUT_STEP_DEG))
+        report(f"LUT kernel on the Q9.7 grid, {label}", d < 1e-9, f"(max |Δ| {d:.1e} m)")
+        # off-grid input: ≤ half a step of angle error on each axis, at up to 30 m
+        tol = 30.0 * (LUT_STEP_DEG / 2) * D2R * math.sqrt(2) * 1.01
+        d = max_err(lut, R_old, triples(n))
+        report(f"LUT kernel off grid, {label}", d <= tol, f"(max |Δ| {d * 1e3:.3f} mm, tol {tol * 1e3:.3f} mm)")
+
+    # out-of-range angles still compute (fallback path), like the old code did
+    d = max_err(PoseRegistry(None, poses=DEFAULT_POSES, lut_step_deg=LUT_STEP_DEG),
+                {aid: old_rot_zyx_inline(*p) for aid, p in DEFAULT_POSES.items()},
+                [(0, 2.0, 400.0, -250.0), (1, 3.0, -181.0, 181.0)])
+    report("LUT kernel outside ±180°", d < 1e-9, f"(max |Δ| {d:.1e} m)")
+
+    # hot reload: change → new poses on the next due check, malformed → previous poses kept
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "poses.json")
+        def write(doc, mtime):
+            with open(path, "w") as f:
+                f.write(doc if isinstance(doc, str) else json.dumps(doc))
+            os.utime(path, ns=(mtime, mtime))
+        write({"anchors": {"0": {"yaw": 0.0}}}, 1_000_000_000)
+        reg = PoseRegistry(path, check_s=1.0)
+        t = time.monotonic_ns()
+        g0 = reg.vectors(0, 1.0, 0.0, 0.0, t)[1]
+        write({"anchors": {"0": [90.0, 0.0, 0.0]}}, 2_000_000_000)
+        g_early = reg.vectors(0, 1.0, 0.0, 0.0, t + 1)[1]             # not due yet: old pose
+        g1 = reg.vectors(0, 1.0, 0.0, 0.0, t + 2_000_000_000)[1]      # due: reloaded
+        report("reload picks up a changed file",
+               abs(g0[0] - 1) < 1e-12 and g_early == g0 and abs(g1[1] - 1) < 1e-12 and reg.reloads == 1)
+        write('{"anchors": {"0": {"yaw": ', 3_000_000_000)
+        g2 = reg.vectors(0, 1.0, 0.0, 0.0, t + 4_000_000_000)[1]
+        report("malformed file keeps previous poses", g2 == g1 and reg.errors == 1)
+
+    print("[check] PASS" if ok else "[check] FAIL")
+    return ok
+
+
+def bench(n: int):
+    samples = triples(n)
+    R_anchor = {aid: old_rot_zyx_inline(*p) for aid, p in DEFAULT_POSES.items()}
+
+    def old_path():
+        for aid, r, az, el in samples:
+            v_local = old_r_local_from_az_el(r, az, el)
+            R = R_anchor.get(aid, ((1,0,0),(0,1,0),(0,0,1)))
+            v_global = old_apply_R(R, v_local)
+
+    def registry_path(reg):
+        def run():
+            t = time.monotonic_ns()
+            vectors = reg.vectors
+            for aid, r, az, el in samples:
+                v_local, v_global = vectors(aid, r, az, el, t)
+        return run
+
+    t0 = time.perf_counter()
+    lut = PoseRegistry(None, poses=DEFAULT_POSES, lut_step_deg=LUT_STEP_DEG)
+    print(f"[bench] LUT build ({len(lut.table)} entries): {(time.perf_counter() - t0) * 1e3:.0f} ms")
+    rows = [("old r_local + apply_R(rot_zyx)", old_path),
+            ("registry, exact trig", registry_path(PoseRegistry(None, poses=DEFAULT_POSES))),
+            ("registry, LUT trig", registry_path(lut))]
+    base = None
+    for name, fn in rows:
+        best = min(_timed(fn) for _ in range(5))
+        ns = best / n * 1e9
+        base = base or ns
+        print(f"[bench] {name:32s} {ns:7.0f} ns/sample  ({base / ns:4.2f}×)")
+
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="uwb_poses equivalence check + benchmark")
+    ap.add_argument("--check", action="store_true", help="Compare against the old transform code")
+    ap.add_argument("--bench", action="store_true", help="Time old path vs fused kernels")
+    ap.add_argument("--n", type=int, default=100_000, help="Samples per run")
+    args = ap.parse_args()
+    if not (args.check or args.bench):
+        args.check = args.bench = True
+    ok = check(args.n) if args.check else True
+    if args.bench:
+        bench(args.n)
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Anchor pose registry for the 2BP UART parsers.
+
+Poses (yaw, pitch, roll in degrees per anchor id) live in a JSON file instead of
+being copied into every script:
+
+  {"anchors": {"0": {"yaw": 45.0}, "1": {"yaw": 135.0, "pitch": 0.0, "roll": 0.0}, ...}}
+  (a [yaw, pitch, roll] list per anchor works too)
+
+yaw: CCW about +Z from global +X; pitch: about +Y; roll: about +X (missing = 0).
+R = Rz(yaw) @ Ry(pitch) @ Rx(roll).
+
+For every anchor a fused kernel is built once: it goes straight from the raw
+(r, az, el) to (local xyz, global xyz) with the rotation entries bound as
+constants, so a sample costs the trig plus 13 multiplies and no helper calls or
+tuple-of-tuples indexing. Anchors without a pose pass the local vector through
+as global, like before.
+
+With lut_step_deg set, cos/sin come from a table instead of math.cos/sin.
+LUT_STEP_DEG is the SR150's AoA resolution (UCI reports angles as Q9.7 degrees),
+so the table holds exactly the angles the chip can produce. Off by default: on
+CPython the int() + indexing costs more than two libm calls (uwb_pose_bench.py),
+so only turn it on where trig is the expensive part.
+
+vectors(aid, r, az, el, now_ns) stats the file at most every check_s seconds and
+reloads it when it changed. The kernels are rebuilt off to the side and swapped
+in with one assignment, so no sample is dropped or sees a half-built table; a file
+that does not parse keeps the previous poses.
+
+usage:
+  python3 uwb_poses.py anchor_poses.json            # print poses and rotation matrices
+
+dependencies: none (see uwb_pose_bench.py for the equivalence check and benchmark)
+"""
+
+import os, sys, json, math, time
+
+DEFAULT_POSE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "anchor_poses.json")
+# used when the pose file does not exist (the poses that used to be hard-coded)
+DEFAULT_POSES = {0: (45.0, 0.0, 0.0), 1: (135.0, 0.0, 0.0), 2: (-135.0, 0.0, 0.0), 3: (-45.0, 0.0, 0.0)}
+LUT_STEP_DEG = 1.0 / 128   # SR150 AoA resolution (Q9.7 degrees)
+
+D2R = math.pi / 180.0
+IDENTITY = ((1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (0.0, 0.0, 1.0))
+
+
+def rot_zyx(yaw_deg: float, pitch_deg: float, roll_deg: float):
+    """R = Rz(yaw) @ Ry(pitch) @ Rx(roll), all degrees, right-handed, + angles are CCW."""
+    cy, sy = math.cos(yaw_deg * D2R),   math.sin(yaw_deg * D2R)
+    cp, sp = math.cos(pitch_deg * D2R), math.sin(pitch_deg * D2R)
+    cr, sr = math.cos(roll_deg * D2R),  math.sin(roll_deg * D2R)
+    return ((cy*cp, cy*sp*sr - sy*cr, cy*sp*cr + sy*sr),
+            (sy*cp, sy*sp*sr + cy*cr, sy*sp*cr - cy*sr),
+            (  -sp,            cp*sr,            cp*cr))
+
+
+def trig_table(step_deg: float):
+    """[(cos, sin)] for -180° … +180° in step_deg steps, index = round((deg + 180) / step)."""
+    n = int(round(360.0 / step_deg))
+    return [(math.cos((i * step_deg - 180.0) * D2R), math.sin((i * step_deg - 180.0) * D2R)) for i in range(n + 1)]
+
+
+def make_kernel(R=None, table=None, step_deg: float = LUT_STEP_DEG):
+    """f(r, az_deg, el_deg) → ((x, y, z) local, (x, y, z) global) for one anchor (R=None: global = local).
+
+    local axes: x=forward, y=left, z=up; +az = right, +el = down (see vectorise-2bp-serial.py).
+    """
+    (r00, r01, r02), (r10, r11, r12), (r20, r21, r22) = R or IDENTITY
+    cos, sin = math.cos, math.sin
+
+    if table is None:
+        def kernel(r, az, el):
+            th, ph = az * D2R, el * D2R
+            rc = r * cos(ph)
+            x, y, z = rc * cos(th), -rc * sin(th), -r * sin(ph)   # minus: +az is RIGHT, +el is DOWN
+            return (x, y, z), (r00*x + r01*y + r02*z, r10*x + r11*y + r12*z, r20*x + r21*y + r22*z)
+        return kernel
+
+    k, off, n = 1.0 / step_deg, 180.0 / step_deg + 0.5, len(table)
+
+    def kernel(r, az, el):
+        i, j = int(az * k + off), int(el * k + off)
+        if 0 <= i < n and 0 <= j < n:
+            cth, sth = table[i]
+            cph, sph = table[j]
+        else:  # outside ±180°: not an SR150 angle, compute it
+            th, ph = az * D2R, el * D2R
+            cth, sth, cph, sph = cos(th), sin(th), cos(ph), sin(ph)
+        rc = r * cph
+        x, y, z = rc * cth, -rc * sth, -r * sph
+        return (x, y, z), (r00*x + r01*y + r02*z, r10*x + r11*y + r12*z, r20*x + r21*y + r22*z)
+    return kernel
+
+
+def load_poses(path: str) -> dict:
+    """{aid: (yaw, pitch, roll)} from a pose file. Raises on a malformed file."""
+    with open(path, "r", encoding="utf-8") as f:
+        doc = json.load(f)
+    poses = {}
+    for aid, p in doc["anchors"].items():
+        if isinstance(p, dict):
+            poses[int(aid)] = (float(p.get("yaw", 0.0)), float(p.get("pitch", 0.0)), float(p.get("roll", 0.0)))
+        else:
+            yaw, pitch, roll = p
+            poses[int(aid)] = (float(yaw), float(pitch), float(roll))
+    return poses
+
+
+class PoseRegistry:
+    def __init__(self, path: str | None = DEFAULT_POSE_FILE, lut_step_deg: float | None = None,
+                 check_s: float = 1.0, poses: dict | None = None):
+        self.path = path
+        self.check_ns = int(check_s * 1e9)
+        self.step = lut_step_deg
+        self.table = trig_table(lut_step_deg) if lut_step_deg else None
+        self.identity = make_kernel(None, self.table, lut_step_deg or LUT_STEP_DEG)
+        self.next_check_ns = 0
+        self.sig = None
+        self.reloads = self.errors = 0
+        self.poses, self.kernels = {}, {}
+        if poses is not None or not (path and os.path.exists(path)):
+            if poses is None:
+                print(f"[poses] {path} not found, using built-in defaults")
+            self._install(DEFAULT_POSES if poses is None else poses)
+        else:
+            if not self.maybe_reload(time.monotonic_ns()):
+                raise ValueError(f"cannot load anchor poses from {path}")
+
+    def _install(self, poses: dict):
+        kernels = {aid: make_kernel(rot_zyx(*pose), self.table, self.step or LUT_STEP_DEG)
+                   for aid, pose in poses.items()}
+        self.poses, self.kernels = dict(poses), kernels  # swap: the parse loop sees old or new, never half
+
+    def _signature(self):
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def maybe_reload(self, now_ns: int) -> bool:
+        """Reload the pose file if it changed. Returns True when new poses were installed."""
+        self.next_check_ns = now_ns + self.check_ns
+        if not self.path:
+            return False
+        try:
+            sig = self._signature()
+        except OSError:
+            return False  # deleted / being replaced: keep current poses
+        if sig == self.sig:
+            return False
+        try:
+            poses = load_poses(self.path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.errors += 1
+            print(f"[poses] reload of {self.path} failed, keeping previous poses: {e}")
+            self.sig = sig  # don't retry until the file changes again
+            return False
+        if self.sig is not None:
+            self.reloads += 1
+            print(f"[poses] reloaded {len(poses)} anchor poses from {self.path}")
+        self.sig = sig
+        self._install(poses)
+        return True
+
+    def kernel(self, aid: int):
+        return self.kernels.get(aid, self.identity)
+
+    def vectors(self, aid: int, r: float, az: float, el: float, now_ns: int | None = None):
+        """(local xyz, global xyz) for one triple; checks the file for changes when now_ns is due."""
+        if now_ns is not None and now_ns >= self.next_check_ns:
+            self.maybe_reload(now_ns)
+        return self.kernels.get(aid, self.identity)(r, az, el)
+
+    def stats(self) -> dict:
+        return {"anchors": len(self.poses), "reloads": self.reloads, "errors": self.errors,
+                "lut_step_deg": self.step}
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_POSE_FILE
+    reg = PoseRegistry(path)
+    for aid, pose in sorted(reg.poses.items()):
+        R = rot_zyx(*pose)
+        print(f"anchor {aid}: yaw {pose[0]:7.2f} pitch {pose[1]:7.2f} roll {pose[2]:7.2f}")
+        for row in R:
+            print("    " + "  ".join(f"{v:+.6f}" for v in row))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Capture-time stamping for the UART parsers.
+
+Each line is stamped with time.monotonic_ns() as soon as the reader has its
+bytes, and a triple carries the arrival time of its first field (the moment
+the SR150 reported the measurement), not the time parsing finished.
+
+WallClock maps monotonic → unix time with one add. The offset is re-estimated
+every resync_s seconds from the tightest of a few (monotonic, wall, monotonic)
+brackets, so NTP steps are picked up without stamping every sample with a
+separate, jittery time.time_ns() call.
+
+HeaderCache formats the ISO-8601 "ts" header: the date/time part is built once
+per second and only the microseconds are appended per message.
+"""
+
+import time
+from datetime import datetime, timezone
+
+
+class WallClock:
+    def __init__(self, resync_s: float = 10.0, probes: int = 3):
+        self.resync_ns = int(resync_s * 1e9)
+        self.probes = probes
+        self.offset_ns = 0
+        self.next_sync_ns = 0
+        self.resync()
+
+    def resync(self) -> int:
+        """Re-estimate unix - monotonic offset. Returns the new offset (ns)."""
+        best = None
+        for _ in range(self.probes):
+            m0 = time.monotonic_ns()
+            w = time.time_ns()
+            m1 = time.monotonic_ns()
+            if best is None or m1 - m0 < best[0]:
+                best = (m1 - m0, w - (m0 + m1) // 2)
+        self.offset_ns = best[1]
+        self.next_sync_ns = time.monotonic_ns() + self.resync_ns
+        return self.offset_ns
+
+    def to_unix_ns(self, mono_ns: int) -> int:
+        """Unix time (ns) of a monotonic_ns() stamp; re-syncs the offset when due."""
+        if mono_ns >= self.next_sync_ns:
+            self.resync()
+        return mono_ns + self.offset_ns
+
+
+class HeaderCache:
+    def __init__(self):
+        self._sec = None
+        self._prefix = ""
+
+    def iso(self, unix_ns: int) -> str:
+        """'YYYY-mm-ddTHH:MM:SS.ffffffZ' for a unix ns timestamp."""
+        sec, frac = divmod(unix_ns, 1_000_000_000)
+        if sec != self._sec:
+            self._sec = sec
+            self._prefix = datetime.fromtimestamp(sec, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.")
+        return f"{self._prefix}{frac // 1000:06d}Z"